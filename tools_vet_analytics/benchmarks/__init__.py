@@ -0,0 +1 @@
+"""Ad-hoc benchmarks for the vet analytics pipeline."""
@@ -0,0 +1,86 @@
+"""Compare wall-clock time of step 03 in sync vs async I/O mode on the same corpus.
+
+Each mode writes evidence blocks under a throwaway ``bench-*`` run_id, which is
+deleted afterwards. Reports are written to a temporary directory.
+
+    python -m tools_vet_analytics.benchmarks.bench_async_io --collection articles --content-field content
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import importlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from ..common.logging import setup_logging
+from ..common.mongo import assert_safe_write_target, connect_from_config
+from ..config import load_env_config
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark sync vs async evidence block generation")
+    p.add_argument("--collection", required=True)
+    p.add_argument("--content-field", required=True)
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--write-batch-size", type=int, default=1000)
+    p.add_argument("--async-batch-size", type=int, default=500)
+    p.add_argument("--async-queue-size", type=int, default=4)
+    p.add_argument("--out", type=str, default="")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    base = load_env_config()
+    base.limit = args.limit
+    base.write_batch_size = args.write_batch_size
+    base.async_batch_size = args.async_batch_size
+    base.async_queue_size = args.async_queue_size
+    mongo = connect_from_config(base)
+    step = importlib.import_module("tools_vet_analytics.steps.03_evidence_blocks")
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Path("reports").mkdir()
+        try:
+            for rep in range(args.repeat):
+                for mode in ("sync", "async"):
+                    cfg = copy.copy(base)
+                    cfg.io_mode = mode
+                    cfg.run_id = cfg.active_run_id = f"bench-{mode}-{uuid.uuid4()}"
+                    ctx = {
+                        "config": cfg,
+                        "logger": setup_logging(cfg.run_id),
+                        "mongo": mongo,
+                        "warnings": [],
+                        "selected_sources": [(args.collection, 0, args.content_field)],
+                    }
+                    t0 = time.perf_counter()
+                    step.run(ctx)
+                    elapsed = time.perf_counter() - t0
+                    blocks = json.loads(Path("reports/evidence_blocks.json").read_text(encoding="utf-8"))["count"]
+                    coll = mongo.write_db["evidence_blocks"]
+                    assert_safe_write_target(coll)
+                    coll.delete_many({"run_id": cfg.run_id})
+                    results.append({"repeat": rep, "mode": mode, "seconds": round(elapsed, 3), "blocks": blocks})
+                    print(f"{mode:>5}  repeat={rep}  blocks={blocks}  {elapsed:.2f}s")
+        finally:
+            os.chdir(cwd)
+
+    by_mode = {m: [r["seconds"] for r in results if r["mode"] == m] for m in ("sync", "async")}
+    best = {m: min(v) for m, v in by_mode.items()}
+    print(f"best sync={best['sync']:.2f}s async={best['async']:.2f}s speedup={best['sync'] / max(best['async'], 1e-9):.2f}x")
+    if args.out:
+        Path(args.out).write_text(json.dumps({"runs": results, "best": best}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
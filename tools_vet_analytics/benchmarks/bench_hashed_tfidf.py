@@ -0,0 +1,75 @@
+"""Benchmark of step 04 vectorization: in-memory build_tfidf vs streamed HashedTfidfWriter.
+
+Texts are generated batch by batch from a synthetic vocabulary, so the hashed path never holds
+the corpus; the in-memory path gets the same texts as one list, as step 04 does today. Peak
+Python heap (tracemalloc) and wall time are printed for both.
+
+    python -m tools_vet_analytics.benchmarks.bench_hashed_tfidf --n 50000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from ..common.hashed_tfidf import HashedTfidfWriter
+from ..common.tfidf import build_tfidf
+
+ALPHABET = "абвгдежзиклмнопрстуфхцчшэюя"
+
+
+def text_batches(n: int, batch: int, words: int, vocab_size: int, seed: int = 7):
+    rnd = random.Random(seed)
+    vocab = ["".join(rnd.choices(ALPHABET, k=rnd.randint(4, 10))) for _ in range(vocab_size)]
+    for start in range(0, n, batch):
+        yield [" ".join(rnd.choices(vocab, k=words)) for _ in range(min(batch, n - start))]
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, seconds, peak / 2 ** 20
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark in-memory vs hashed out-of-core TF-IDF")
+    p.add_argument("--n", type=int, default=50000, help="Blocks (rows)")
+    p.add_argument("--words", type=int, default=200, help="Words per block")
+    p.add_argument("--vocab", type=int, default=50000)
+    p.add_argument("--batch", type=int, default=5000)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    def batches():
+        return text_batches(args.n, args.batch, args.words, args.vocab)
+
+    tmp = tempfile.mkdtemp()
+    try:
+
+        def hashed():
+            writer = HashedTfidfWriter(tmp, "bench", "blocks_hashed", use_stopwords=False)
+            for texts in batches():
+                writer.add(texts)
+            return writer.finish()
+
+        mat_h, t_h, peak_h = measure(hashed)
+        (_, mat_m), t_m, peak_m = measure(lambda: build_tfidf([t for b in batches() for t in b], use_stopwords=False))
+        print(f"{args.n} blocks x {args.words} words")
+        print(f"{'in-memory':>10}  {t_m:8.2f}s  peak {peak_m:8.1f} MiB  nnz {mat_m.nnz}")
+        print(f"{'hashed':>10}  {t_h:8.2f}s  peak {peak_h:8.1f} MiB  nnz {mat_h.nnz} (on disk)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark of text normalization: legacy regex chain vs TextNormalizer.
+
+Inputs are synthetic Russian-like lines (or lines from --file). Outputs of every
+variant are checked to be identical to the legacy chain before timings are printed.
+
+    python -m tools_vet_analytics.benchmarks.bench_normalize --n 200000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import regex as re
+
+from ..common.normalize import get_normalizer
+
+WORDS = (
+    "Собака кошка Ёж рвота диарея температура ОСМОТР врач клиника срочно если нужно "
+    "животное лечение анализ крови УЗИ рентген симптомы боль вялость аппетит"
+).split()
+PUNCT = ["", "", "", ".", ",", "!!", "??", "...", ";", ":"]
+
+
+def legacy_normalize(text: str) -> str:
+    t = (text or "").lower().replace("ё", "е")
+    t = re.sub(r"[\t\r\f\v]+", " ", t)
+    t = re.sub(r"([!?.,;:])\1{1,}", r"\1", t)
+    t = re.sub(r"\s+", " ", t).strip()
+    t = re.sub(r"^страница\s+\d+\s*$", "", t, flags=re.I)
+    return t
+
+
+def synthetic_lines(n: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        if i % 50 == 0:
+            out.append(f"Страница {rnd.randint(1, 300)}")
+            continue
+        words = [rnd.choice(WORDS) + rnd.choice(PUNCT) for _ in range(rnd.randint(3, 30))]
+        out.append(rnd.choice([" ", "  ", "\t"]).join(words))
+    return out
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark text normalization")
+    p.add_argument("--n", type=int, default=100000, help="Synthetic lines (ignored with --file)")
+    p.add_argument("--file", type=str, default="", help="UTF-8 text file, one input per line")
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.add_argument("--repeat", type=int, default=3)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    lines = Path(args.file).read_text(encoding="utf-8").splitlines() if args.file else synthetic_lines(args.n)
+    norm = get_normalizer("ru")
+    bs = max(1, args.batch_size)
+
+    def batched():
+        out = []
+        for i in range(0, len(lines), bs):
+            out.extend(norm.normalize_many(lines[i:i + bs]))
+        return out
+
+    expected = [legacy_normalize(x) for x in lines]
+    assert [norm.normalize(x) for x in lines] == expected, "normalize() differs from legacy output"
+    assert batched() == expected, "normalize_many() differs from legacy output"
+
+    chars = sum(len(x) for x in lines)
+    results = {
+        "legacy": _best(lambda: [legacy_normalize(x) for x in lines], args.repeat),
+        "normalize": _best(lambda: [norm.normalize(x) for x in lines], args.repeat),
+        f"normalize_many[{bs}]": _best(batched, args.repeat),
+    }
+    base = results["legacy"]
+    print(f"{len(lines)} inputs, {chars / 1e6:.1f}M chars, outputs identical")
+    for name, sec in results.items():
+        print(f"{name:>22}  {sec:.3f}s  {chars / sec / 1e6:7.1f} Mchar/s  {base / sec:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError
+
+from .mongo import (
+    REQUIRED_WRITE_DB,
+    UpsertBatchResult,
+    UpsertReport,
+    _srv_to_direct_uri,
+    assert_safe_write_target,
+    drop_unchanged,
+    existing_query,
+    iter_upsert_batches,
+    raise_on_upsert_errors,
+    record_bulk_result,
+    upsert_ops,
+)
+
+_DONE = object()
+
+
+@dataclass
+class AsyncMongoBundle:
+    read_client: AsyncMongoClient
+    write_client: AsyncMongoClient
+    read_db: Any
+    write_db: Any
+
+    async def close(self) -> None:
+        await self.read_client.close()
+        if self.write_client is not self.read_client:
+            await self.write_client.close()
+
+
+async def _make_async_client(uri: str, cfg) -> AsyncMongoClient:
+    # Reuse a cached SRV fallback from the sync connection layer; the driver resolves SRV itself otherwise.
+    uri = _srv_to_direct_uri(uri, cfg.srv_cache_path, cfg.srv_cache_ttl_s, cached_only=True)
+    client = AsyncMongoClient(
+        uri,
+        maxPoolSize=cfg.mongo_max_pool_size,
+        serverSelectionTimeoutMS=cfg.mongo_timeout_ms,
+        socketTimeoutMS=cfg.mongo_socket_timeout_ms or None,
+    )
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        await client.close()
+        raise
+    return client
+
+
+async def connect_mongo_async(cfg) -> AsyncMongoBundle:
+    if cfg.mongo_db_write != REQUIRED_WRITE_DB:
+        raise RuntimeError(f"Write DB must be {REQUIRED_WRITE_DB}, got {cfg.mongo_db_write}")
+    read_client = await _make_async_client(cfg.mongo_uri_read, cfg)
+    if cfg.mongo_uri_write == cfg.mongo_uri_read:
+        write_client = read_client
+    else:
+        write_client = await _make_async_client(cfg.mongo_uri_write, cfg)
+    return AsyncMongoBundle(read_client, write_client, read_client[cfg.mongo_db_read], write_client[cfg.mongo_db_write])
+
+
+async def async_safe_upsert_many(
+    collection,
+    docs: Iterable[Dict[str, Any]],
+    key_field: str,
+    run_id: str,
+    dry_run: bool = False,
+    batch_size: int = 1000,
+    report: Optional[UpsertReport] = None,
+    diff_field: Optional[str] = None,
+) -> int:
+    assert_safe_write_target(collection)
+    if dry_run:
+        return sum(1 for _ in docs)
+    report = report if report is not None else UpsertReport(collection.name)
+    n = 0
+    for batch, batch_n in iter_upsert_batches(docs, key_field, max(1, batch_size)):
+        t0 = time.perf_counter()
+        skipped = 0
+        if diff_field:
+            flt, proj = existing_query(batch, key_field, run_id, diff_field)
+            rows = await collection.find(flt, proj).to_list(None)
+            skipped = drop_unchanged(batch, rows, key_field, diff_field)
+        res = UpsertBatchResult(batch_index=len(report.batches), size=len(batch), skipped=skipped)
+        n += batch_n
+        if not batch:
+            res.seconds = time.perf_counter() - t0
+            report.batches.append(res)
+            continue
+        try:
+            out = await collection.bulk_write(upsert_ops(batch, key_field, run_id), ordered=False)
+            res.seconds = time.perf_counter() - t0
+            record_bulk_result(collection.name, res, out)
+        except BulkWriteError as exc:
+            res.seconds = time.perf_counter() - t0
+            record_bulk_result(collection.name, res, exc=exc)
+        report.batches.append(res)
+    raise_on_upsert_errors(report)
+    return n
+
+
+async def run_pipeline(
+    cursors: List[Any],
+    transform: Callable[[List[Dict[str, Any]], int], Any],
+    sink: Optional[Callable[[Any], Awaitable[None]]] = None,
+    batch_size: int = 500,
+    queue_size: int = 4,
+) -> None:
+    """Overlap cursor fetches, CPU work and writes with bounded queues.
+
+    Cursors are read one after another into a queue of doc batches. Each batch is
+    transformed in a worker thread as ``transform(batch, cursor_index)`` so the event
+    loop keeps fetching; non-None results go to ``sink`` on a second queue.
+    """
+    read_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    write_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def reader() -> None:
+        for i, cur in enumerate(cursors):
+            while True:
+                batch = await cur.to_list(batch_size)
+                if not batch:
+                    break
+                await read_q.put((i, batch))
+        await read_q.put(_DONE)
+
+    async def worker() -> None:
+        while True:
+            item = await read_q.get()
+            if item is _DONE:
+                break
+            i, batch = item
+            result = await asyncio.to_thread(transform, batch, i)
+            if sink is not None and result is not None:
+                await write_q.put(result)
+        if sink is not None:
+            await write_q.put(_DONE)
+
+    async def writer() -> None:
+        while True:
+            item = await write_q.get()
+            if item is _DONE:
+                break
+            await sink(item)
+
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(worker())]
+    if sink is not None:
+        tasks.append(asyncio.create_task(writer()))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
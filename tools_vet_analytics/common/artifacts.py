@@ -0,0 +1,169 @@
+"""On-disk run artifacts (numpy arrays and small JSON metadata) under ``<artifacts_dir>/<run_id>/``.
+
+Arrays are stored as ``.npy`` so readers can memory-map them instead of loading whole matrices.
+Fitted TF-IDF models (vocabulary, idf, CSR matrix) and cluster fits are stored with the
+corpus hash they were built from, and are only reused when the hash matches.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from .tfidf import build_tfidf, restore_vectorizer
+
+
+def run_dir(base: str, run_id: str) -> Path:
+    return Path(base) / run_id
+
+
+def save_array(base: str, run_id: str, name: str, arr: np.ndarray) -> Path:
+    path = run_dir(base, run_id) / f"{name}.npy"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, np.ascontiguousarray(arr))
+    tmp.replace(path)
+    return path
+
+
+def load_array(base: str, run_id: str, name: str, mmap: bool = True) -> Optional[np.ndarray]:
+    path = run_dir(base, run_id) / f"{name}.npy"
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def save_json(base: str, run_id: str, name: str, obj: Any) -> Path:
+    path = run_dir(base, run_id) / f"{name}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(obj, ensure_ascii=False, default=str), encoding="utf-8")
+    return path
+
+
+def load_json(base: str, run_id: str, name: str) -> Optional[Any]:
+    path = run_dir(base, run_id) / f"{name}.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_block_embedding(base: str, run_id: str, block_ids, embedding: np.ndarray, meta: Dict[str, Any]) -> Path:
+    save_json(base, run_id, "block_embedding_ids", list(block_ids))
+    save_json(base, run_id, "block_embedding_meta", meta)
+    return save_array(base, run_id, "block_embedding", embedding)
+
+
+def load_block_embedding(base: str, run_id: str):
+    """(block_ids, memory-mapped float32 embedding, meta) from step 04, or None if it was not persisted."""
+    emb = load_array(base, run_id, "block_embedding")
+    ids = load_json(base, run_id, "block_embedding_ids")
+    if emb is None or ids is None:
+        return None
+    return ids, emb, load_json(base, run_id, "block_embedding_meta") or {}
+
+
+def corpus_hash(items: Iterable[str], params: Optional[Dict[str, Any]] = None) -> str:
+    """sha1 over the ordered row keys plus the parameters the artifact depends on."""
+    h = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    for item in items:
+        h.update(b"\x00")
+        h.update(str(item).encode("utf-8"))
+    return h.hexdigest()
+
+
+def save_vectorizer(base: str, run_id: str, name: str, key: str, vec, params: Dict[str, Any], **meta) -> None:
+    terms: List[str] = [None] * len(vec.vocabulary_)
+    for term, i in vec.vocabulary_.items():
+        terms[i] = term
+    save_array(base, run_id, f"{name}_idf", vec.idf_)
+    save_json(base, run_id, f"{name}_vocab", terms)
+    # Written last: a meta file means the arrays next to it are complete.
+    save_json(base, run_id, f"{name}_meta", {"corpus_hash": key, "params": params, **meta})
+
+
+def load_vectorizer(base: str, run_id: str, name: str):
+    """(fitted vectorizer, meta) saved under name by run_id, whatever corpus it was built from, else None."""
+    meta = load_json(base, run_id, f"{name}_meta")
+    idf = load_array(base, run_id, f"{name}_idf", mmap=False)
+    terms = load_json(base, run_id, f"{name}_vocab")
+    if meta is None or idf is None or terms is None:
+        return None
+    return restore_vectorizer(terms, idf, **meta["params"]), meta
+
+
+def save_tfidf(base: str, run_id: str, name: str, key: str, vec, mat, params: Dict[str, Any]) -> None:
+    mat = sparse.csr_matrix(mat)
+    save_array(base, run_id, f"{name}_data", mat.data)
+    save_array(base, run_id, f"{name}_indices", mat.indices)
+    save_array(base, run_id, f"{name}_indptr", mat.indptr)
+    save_vectorizer(base, run_id, name, key, vec, params, shape=list(mat.shape))
+
+
+def load_tfidf(base: str, run_ids: Sequence[str], name: str, key: str):
+    """(vectorizer, memory-mapped CSR matrix, run_id) from the first run whose artifact matches key, else None."""
+    for run_id in dict.fromkeys(r for r in run_ids if r):
+        meta = load_json(base, run_id, f"{name}_meta")
+        if not meta or meta.get("corpus_hash") != key or "shape" not in meta:
+            continue
+        parts = [load_array(base, run_id, f"{name}_{p}") for p in ("data", "indices", "indptr", "idf")]
+        terms = load_json(base, run_id, f"{name}_vocab")
+        if any(p is None for p in parts) or terms is None:
+            continue
+        data, indices, indptr, idf = parts
+        mat = sparse.csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False)
+        return restore_vectorizer(terms, np.asarray(idf), **meta["params"]), mat, run_id
+    return None
+
+
+def cached_tfidf(
+    cfg,
+    run_ids: Sequence[str],
+    name: str,
+    keys: Iterable[str],
+    texts_fn: Callable[[], List[str]],
+    **params,
+):
+    """build_tfidf with on-disk reuse when cfg.persist_tfidf is set; returns (vec, mat, reused_from_run_id)."""
+    if not cfg.persist_tfidf:
+        return (*build_tfidf(texts_fn(), **params), None)
+    key = corpus_hash(keys, {"name": name, **params})
+    hit = load_tfidf(cfg.artifacts_dir, run_ids, name, key)
+    if hit is not None:
+        return hit
+    vec, mat = build_tfidf(texts_fn(), **params)
+    save_tfidf(cfg.artifacts_dir, cfg.run_id, name, key, vec, mat, params)
+    return vec, mat, None
+
+
+def save_clustering(
+    base: str,
+    run_id: str,
+    key: str,
+    labels: np.ndarray,
+    centers: np.ndarray,
+    meta: Dict[str, Any],
+    block_ids: Optional[Sequence[str]] = None,
+) -> None:
+    save_array(base, run_id, "cluster_labels", np.asarray(labels, dtype=np.int32))
+    save_array(base, run_id, "cluster_centers", np.asarray(centers))
+    if block_ids is not None:
+        save_json(base, run_id, "cluster_block_ids", list(block_ids))
+    save_json(base, run_id, "cluster_meta", {"key": key, **meta})
+
+
+def load_clustering(base: str, run_ids: Sequence[str], key: Optional[str]):
+    """(labels, centers, meta) saved under key by the first matching run (any key if None), else None."""
+    for run_id in dict.fromkeys(r for r in run_ids if r):
+        meta = load_json(base, run_id, "cluster_meta")
+        if not meta or (key is not None and meta.get("key") != key):
+            continue
+        labels = load_array(base, run_id, "cluster_labels", mmap=False)
+        centers = load_array(base, run_id, "cluster_centers", mmap=False)
+        if labels is None or centers is None:
+            continue
+        return labels, centers, {**meta, "run_id": run_id}
+    return None
@@ -0,0 +1,102 @@
+"""Lazy access to evidence block text.
+
+Blocks written with ``--block-text-mode offsets`` store only
+(source_collection, source_doc_id, content_field, char_start, char_end, text_hash).
+BlockTextResolver slices the text out of the source document on demand, fetching
+sources in batches and keeping a bounded LRU of source texts. Inline blocks are
+returned as-is, so steps 04-06 work with either representation.
+"""
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from .evidence import get_dotted_value
+from .hashing import sha1_text
+
+logger = logging.getLogger("vet_analytics")
+
+# Fields a resolver needs besides block_id; use as a projection when reading evidence_blocks.
+BLOCK_TEXT_FIELDS = ("text", "source_collection", "source_doc_id", "content_field", "char_start", "char_end", "text_hash")
+
+
+def _id_candidates(doc_id: str) -> List[Any]:
+    # source_doc_id is str(_id); try the original BSON types before the plain string.
+    out: List[Any] = []
+    if ObjectId.is_valid(doc_id):
+        out.append(ObjectId(doc_id))
+    if doc_id.lstrip("-").isdigit():
+        out.append(int(doc_id))
+    out.append(doc_id)
+    return out
+
+
+class BlockTextResolver:
+    def __init__(self, rdb, cache_docs: int = 2000, fetch_batch: int = 500):
+        self.rdb = rdb
+        self.cache_docs = cache_docs
+        self.fetch_batch = fetch_batch
+        self._cache: "OrderedDict[Tuple[str, str, str], Optional[str]]" = OrderedDict()
+        self.fetched = 0
+        self.missing = 0
+        self.hash_mismatch = 0
+
+    def _remember(self, key: Tuple[str, str, str], text: Optional[str]) -> None:
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_docs:
+            self._cache.popitem(last=False)
+
+    def prefetch(self, blocks: Iterable[Dict[str, Any]]) -> None:
+        wanted: Dict[Tuple[str, str], set] = defaultdict(set)
+        for b in blocks:
+            if "text" in b:
+                continue
+            key = (b["source_collection"], b["content_field"], b["source_doc_id"])
+            if key not in self._cache:
+                wanted[(b["source_collection"], b["content_field"])].add(b["source_doc_id"])
+        for (coll, field), ids in wanted.items():
+            ids = sorted(ids)
+            for i in range(0, len(ids), self.fetch_batch):
+                chunk = ids[i:i + self.fetch_batch]
+                found = {}
+                cands = [c for doc_id in chunk for c in _id_candidates(doc_id)]
+                for doc in self.rdb[coll].find({"_id": {"$in": cands}}, {field: 1}):
+                    val = get_dotted_value(doc, field)
+                    found[str(doc["_id"])] = val if isinstance(val, str) else None
+                self.fetched += len(found)
+                for doc_id in chunk:
+                    self._remember((coll, field, doc_id), found.get(doc_id))
+
+    def text(self, block: Dict[str, Any]) -> str:
+        if "text" in block:
+            return block["text"] or ""
+        key = (block["source_collection"], block["content_field"], block["source_doc_id"])
+        if key not in self._cache:
+            self.prefetch([block])
+        src = self._cache.get(key)
+        if src is None:
+            self.missing += 1
+            return ""
+        chunk = src[block["char_start"]:block["char_end"]]
+        if block.get("text_hash") and sha1_text(chunk) != block["text_hash"]:
+            # Source edited after chunking; the offsets no longer point at the indexed text.
+            self.hash_mismatch += 1
+            if self.hash_mismatch == 1:
+                logger.warning("Evidence block %s no longer matches its source text", block.get("block_id"))
+            return ""
+        return chunk
+
+    def texts(self, blocks: List[Dict[str, Any]]) -> List[str]:
+        out: List[str] = []
+        for i in range(0, len(blocks), self.cache_docs):
+            part = blocks[i:i + self.cache_docs]
+            self.prefetch(part)
+            out.extend(self.text(b) for b in part)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"source_docs_fetched": self.fetched, "missing_sources": self.missing, "hash_mismatches": self.hash_mismatch}
@@ -0,0 +1,264 @@
+"""Clustering engines for concept discovery (step 04).
+
+Every engine takes a (sparse or dense) row matrix and returns a ClusterResult with
+labels for all rows, cluster centers and fit diagnostics:
+
+- ``kmeans``: full-batch KMeans(n_init=10), the original behaviour.
+- ``minibatch``: MiniBatchKMeans; much cheaper per iteration on large corpora.
+- ``spherical``: cosine k-means on L2-normalized rows; centers are unit vectors and
+  assignment is a single sparse-dense product per iteration.
+
+With ``sample_size`` the engine is fit on a random sample of rows and all rows are then
+assigned to the nearest center in chunks. ``sweep_k`` fits several candidate k values on a
+sample in a process pool and scores each by cosine silhouette.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+from sklearn.decomposition import TruncatedSVD
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import normalize
+
+ENGINES = ("kmeans", "minibatch", "spherical")
+
+
+@dataclass
+class ClusterResult:
+    labels: np.ndarray
+    centers: np.ndarray
+    engine: str
+    k: int
+    inertia: float
+    n_iter: int
+    fit_seconds: float
+    assign_seconds: float = 0.0
+    sample_size: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        out = asdict(self)
+        for key in ("labels", "centers"):
+            out.pop(key)
+        out["inertia"] = round(self.inertia, 6)
+        out["fit_seconds"] = round(self.fit_seconds, 3)
+        out["assign_seconds"] = round(self.assign_seconds, 3)
+        return out
+
+
+def reduce_dimensions(X, n_components: int, random_state: int = 42):
+    """LSA: TruncatedSVD to n_components, float32, rows re-normalized to unit length.
+
+    Returns (embedding, svd, info) or (X, None, info) when the matrix is too small to reduce.
+    """
+    n_components = min(n_components, X.shape[1] - 1, X.shape[0] - 1)
+    if n_components < 1:
+        return X, None, {"components": 0, "skipped": "matrix too small"}
+    t0 = time.perf_counter()
+    svd = TruncatedSVD(n_components=n_components, algorithm="randomized", random_state=random_state)
+    emb = normalize(svd.fit_transform(X)).astype(np.float32)
+    info = {
+        "components": n_components,
+        "explained_variance": round(float(svd.explained_variance_ratio_.sum()), 6),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "dtype": "float32",
+    }
+    return emb, svd, info
+
+
+def _row_sq_norms(X) -> np.ndarray:
+    if sparse.issparse(X):
+        return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return np.einsum("ij,ij->i", X, X)
+
+
+def assign_nearest(X, centers: np.ndarray, metric: str = "euclidean", chunk: int = 4096):
+    """Nearest center per row in chunks; returns (labels, per-row distance).
+
+    Euclidean distances are squared (KMeans inertia convention); cosine distances are 1 - cos
+    and assume L2-normalized rows and centers.
+    """
+    n = X.shape[0]
+    labels = np.empty(n, dtype=np.int32)
+    dist = np.empty(n, dtype=np.float64)
+    c_sq = np.einsum("ij,ij->i", centers, centers)
+    for start in range(0, n, chunk):
+        part = X[start:start + chunk]
+        prod = np.asarray(part @ centers.T)
+        if metric == "cosine":
+            best = prod.argmax(axis=1)
+            labels[start:start + len(best)] = best
+            dist[start:start + len(best)] = 1.0 - prod[np.arange(len(best)), best]
+        else:
+            d = _row_sq_norms(part)[:, None] - 2.0 * prod + c_sq[None, :]
+            best = d.argmin(axis=1)
+            labels[start:start + len(best)] = best
+            dist[start:start + len(best)] = np.maximum(d[np.arange(len(best)), best], 0.0)
+    return labels, dist
+
+
+def _spherical_fit(X, k: int, random_state: int, max_iter: int, init: Optional[np.ndarray] = None, tol: float = 1e-6):
+    X = normalize(X)
+    if init is None:
+        centers, _ = kmeans_plusplus(X, k, random_state=random_state)
+        centers = np.asarray(centers.toarray() if sparse.issparse(centers) else centers, dtype=np.float64)
+    else:
+        centers = np.asarray(init, dtype=np.float64)
+    centers = normalize(centers)
+    n = X.shape[0]
+    labels = np.full(n, -1, dtype=np.int32)
+    prev_obj = -np.inf
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        new_labels, dist = assign_nearest(X, centers, metric="cosine")
+        obj = -dist.sum()
+        membership = sparse.csr_matrix((np.ones(n), (new_labels, np.arange(n))), shape=(k, n))
+        sums = np.asarray((membership @ X).todense() if sparse.issparse(X) else membership @ X)
+        empty = np.asarray(membership.sum(axis=1)).ravel() == 0
+        if empty.any():
+            # Re-seed empty clusters with the rows farthest from their center.
+            far = np.argsort(dist)[::-1][: int(empty.sum())]
+            rows = X[far]
+            sums[empty] = rows.toarray() if sparse.issparse(rows) else rows
+        centers = normalize(sums)
+        converged = np.array_equal(new_labels, labels) or obj - prev_obj <= tol * abs(obj)
+        labels, prev_obj = new_labels, obj
+        if converged:
+            break
+    labels, dist = assign_nearest(X, centers, metric="cosine")
+    return labels, centers, float(dist.sum()), n_iter
+
+
+def fit_clusters(
+    X,
+    k: int,
+    engine: str = "kmeans",
+    sample_size: int = 0,
+    random_state: int = 42,
+    max_iter: int = 100,
+    batch_size: int = 1024,
+    init: Optional[np.ndarray] = None,
+) -> ClusterResult:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown clustering engine {engine!r}; expected one of {ENGINES}")
+    n = X.shape[0]
+    k = max(1, min(k, n))
+    fit_X = X
+    sampled = 0
+    if sample_size and sample_size < n:
+        rng = np.random.default_rng(random_state)
+        idx = np.sort(rng.choice(n, size=max(sample_size, k), replace=False))
+        fit_X = X[idx]
+        sampled = len(idx)
+
+    t0 = time.perf_counter()
+    metric = "euclidean"
+    if engine == "spherical":
+        labels, centers, inertia, n_iter = _spherical_fit(fit_X, k, random_state, max_iter, init=init)
+        metric = "cosine"
+    else:
+        if engine == "kmeans":
+            model = KMeans(
+                n_clusters=k,
+                random_state=random_state,
+                n_init=1 if init is not None else 10,
+                init=init if init is not None else "k-means++",
+                max_iter=max_iter if init is not None else 300,
+            )
+        else:
+            model = MiniBatchKMeans(
+                n_clusters=k,
+                random_state=random_state,
+                batch_size=batch_size,
+                n_init=1 if init is not None else 3,
+                init=init if init is not None else "k-means++",
+                max_iter=max_iter,
+            )
+        labels = model.fit_predict(fit_X)
+        centers = model.cluster_centers_
+        inertia = float(model.inertia_)
+        n_iter = int(model.n_iter_)
+    fit_seconds = time.perf_counter() - t0
+
+    assign_seconds = 0.0
+    if sampled:
+        t0 = time.perf_counter()
+        labels, dist = assign_nearest(normalize(X) if metric == "cosine" else X, centers, metric=metric)
+        inertia = float(dist.sum())
+        assign_seconds = time.perf_counter() - t0
+    return ClusterResult(
+        labels=np.asarray(labels),
+        centers=np.asarray(centers),
+        engine=engine,
+        k=k,
+        inertia=inertia,
+        n_iter=n_iter,
+        fit_seconds=fit_seconds,
+        assign_seconds=assign_seconds,
+        sample_size=sampled,
+        extra={"metric": metric, "warm_start": init is not None},
+    )
+
+
+def _score_k(args) -> Dict[str, Any]:
+    X, k, engine, random_state, batch_size = args
+    res = fit_clusters(X, k, engine=engine, random_state=random_state, batch_size=batch_size)
+    t0 = time.perf_counter()
+    n_labels = len(np.unique(res.labels))
+    score = float(silhouette_score(X, res.labels, metric="cosine", random_state=random_state)) if 1 < n_labels < X.shape[0] else -1.0
+    return {
+        "k": res.k,
+        "score": round(score, 6),
+        "inertia": round(res.inertia, 6),
+        "n_iter": res.n_iter,
+        "fit_seconds": round(res.fit_seconds, 3),
+        "score_seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def sweep_k(
+    X,
+    candidates: Sequence[int],
+    engine: str = "kmeans",
+    sample_size: int = 5000,
+    workers: int = 0,
+    random_state: int = 42,
+    batch_size: int = 1024,
+) -> Dict[str, Any]:
+    """Fit every candidate k on one row sample in parallel and pick the best cosine silhouette.
+
+    Ties go to the smaller k. Returns {"chosen_k", "sample_size", "workers", "sweep": [...]}.
+    """
+    n = X.shape[0]
+    sample = X
+    if sample_size and sample_size < n:
+        rng = np.random.default_rng(random_state)
+        sample = X[np.sort(rng.choice(n, size=sample_size, replace=False))]
+    ks = sorted({max(2, min(int(k), sample.shape[0] - 1)) for k in candidates if int(k) > 0})
+    if not ks:
+        raise ValueError("auto-k needs at least one candidate k and two sampled rows")
+    workers = min(len(ks), workers or os.cpu_count() or 1)
+    jobs = [(sample, k, engine, random_state, batch_size) for k in ks]
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sweep: List[Dict[str, Any]] = list(pool.map(_score_k, jobs))
+    else:
+        sweep = [_score_k(job) for job in jobs]
+    best = max(sweep, key=lambda r: (r["score"], -r["k"]))
+    return {
+        "chosen_k": best["k"],
+        "metric": "silhouette_cosine",
+        "engine": engine,
+        "sample_size": sample.shape[0],
+        "workers": workers,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "sweep": sweep,
+    }
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .hashing import sha1_text
+from .ids import canonical_hash
+from .langid import LanguageIdentifier
+from .mongo import UpsertReport, safe_upsert_many
+from .normalize import split_chunk_offsets
+
+INVALID_LANG = {"", "none", "und"}
+
+SOURCE_PROJECTION_FIELDS = ("title", "name", "language", "lang", "lang_tag", "locale", "source_locale")
+
+
+def get_dotted_value(doc, path):
+    cur = doc
+    for key in path.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(key)
+        if cur is None:
+            return None
+    return cur
+
+
+def locale_matches_prefix(locale: str, include_locales: list[str]) -> bool:
+    if not include_locales:
+        return True
+    norm = (locale or "und").strip().lower()
+    return any(norm.startswith(pref) for pref in include_locales)
+
+
+_DEFAULT_LANGID: Optional[LanguageIdentifier] = None
+
+
+def _default_langid() -> LanguageIdentifier:
+    global _DEFAULT_LANGID
+    if _DEFAULT_LANGID is None:
+        _DEFAULT_LANGID = LanguageIdentifier()
+    return _DEFAULT_LANGID
+
+
+def heuristic_locale(text: str) -> str:
+    return _default_langid().detect(text)
+
+
+def metadata_locale(doc) -> Optional[str]:
+    lang_tag = str(doc.get("lang_tag") or "").strip().lower()
+    if lang_tag:
+        return lang_tag
+
+    language = str(doc.get("language") or doc.get("lang") or doc.get("locale") or doc.get("source_locale") or "").strip().lower()
+    if language and language not in INVALID_LANG:
+        return language
+    return None
+
+
+def effective_locale(doc, text: str) -> str:
+    return metadata_locale(doc) or heuristic_locale(text)
+
+
+def doc_blocks(
+    doc, coll: str, content_field: str, cfg, include_locales: list[str], locale: Optional[str] = None
+) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    text = get_dotted_value(doc, content_field)
+    if not isinstance(text, str) or not text.strip():
+        return None, []
+    locale = locale or effective_locale(doc, text)
+    if not locale_matches_prefix(locale, include_locales):
+        return None, []
+
+    blocks = []
+    inline = cfg.block_text_mode != "offsets"
+    for i, (start, end) in enumerate(split_chunk_offsets(text, cfg.chunk_size_chars, cfg.overlap_chars)):
+        chunk = text[start:end]
+        bh = sha1_text(chunk)
+        block_id = sha1_text(f"{coll}|{doc.get('_id')}|{i}|{bh}")
+        block = {
+            "block_id": block_id,
+            "run_id": cfg.run_id,
+            "source_collection": coll,
+            "source_doc_id": str(doc.get("_id")),
+            "title": doc.get("title") or doc.get("name"),
+            "source_locale": locale,
+            "content_field": content_field,
+            "char_start": start,
+            "char_end": end,
+            "text_hash": bh,
+            "char_len": len(chunk),
+            "block_index": i,
+        }
+        if inline:
+            block["text"] = chunk
+        # block_id already pins the chunk text; build_hash also covers title, locale, offsets and text mode.
+        block["build_hash"] = canonical_hash({k: v for k, v in block.items() if k != "run_id"})
+        blocks.append(block)
+    return locale, blocks
+
+
+def write_blocks(wdb, cfg, blocks: Iterable[Dict[str, Any]], report: Optional[UpsertReport] = None) -> int:
+    return safe_upsert_many(
+        wdb["evidence_blocks"],
+        blocks,
+        "block_id",
+        cfg.run_id,
+        dry_run=cfg.dry_run,
+        batch_size=cfg.write_batch_size,
+        report=report,
+        diff_field="build_hash" if cfg.skip_unchanged_writes else None,
+    )
+
+
+class EvidenceCollector:
+    """Turns source docs into evidence blocks and keeps the step 03 report stats.
+
+    With keep_blocks=False the caller owns the returned blocks (e.g. streams them to a writer).
+    Given wdb and cfg.block_flush_size > 0 the collector streams instead: blocks are written
+    every block_flush_size blocks and only the running stats stay in memory.
+    """
+
+    def __init__(self, cfg, keep_blocks: bool = True, wdb=None):
+        self.cfg = cfg
+        self.include_locales = cfg.include_locales or []
+        self.keep_blocks = keep_blocks
+        self.wdb = wdb
+        self.streaming = wdb is not None and cfg.block_flush_size > 0
+        self.blocks: List[Dict[str, Any]] = []
+        self.sources: List[Tuple[str, int, str]] = []
+        self.stats: Dict[str, Any] = {"locale_count": Counter(), "count": 0, "chars": 0, "flushes": 0}
+        self.langid = LanguageIdentifier(cache_path=getattr(cfg, "langid_cache_path", ""))
+        self.write_report = UpsertReport("evidence_blocks")
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _flush_pending(self, size: int = 0) -> None:
+        while self._pending and len(self._pending) >= size:
+            n = size or len(self._pending)
+            write_blocks(self.wdb, self.cfg, self._pending[:n], self.write_report)
+            self.stats["flushes"] += 1
+            del self._pending[:n]
+
+    def finish(self) -> None:
+        """Write whatever the scan left behind: the last partial flush, or every kept block."""
+        if self.streaming:
+            with self._lock:
+                self._flush_pending()
+        else:
+            write_blocks(self.wdb, self.cfg, self.blocks, self.write_report)
+
+    def add_docs(self, docs: List[Dict[str, Any]], coll: str, content_field: str) -> List[Dict[str, Any]]:
+        # Metadata wins; everything else goes through one batched language-ID call.
+        texts = [get_dotted_value(d, content_field) for d in docs]
+        locales: List[Optional[str]] = [None] * len(docs)
+        pending = []
+        for i, (doc, text) in enumerate(zip(docs, texts)):
+            if not isinstance(text, str) or not text.strip():
+                continue
+            locales[i] = metadata_locale(doc)
+            if locales[i] is None:
+                pending.append(i)
+        if pending:
+            for i, loc in zip(pending, self.langid.detect_many([texts[i] for i in pending])):
+                locales[i] = loc
+
+        out: List[Dict[str, Any]] = []
+        for doc, loc in zip(docs, locales):
+            if loc is None:
+                continue
+            locale, blocks = doc_blocks(doc, coll, content_field, self.cfg, self.include_locales, locale=loc)
+            if locale is None:
+                continue
+            self.stats["locale_count"][locale] += len(blocks)
+            self.stats["count"] += len(blocks)
+            self.stats["chars"] += sum(b["char_len"] for b in blocks)
+            out.extend(blocks)
+        if self.streaming:
+            with self._lock:
+                self._pending.extend(out)
+                self._flush_pending(self.cfg.block_flush_size)
+        elif self.keep_blocks:
+            self.blocks.extend(out)
+        return out
@@ -0,0 +1,180 @@
+"""Out-of-core TF-IDF over hashed features.
+
+HashingVectorizer needs no vocabulary, so blocks can be vectorized batch by batch as they come
+off the cursor. HashedTfidfWriter appends each batch's raw term counts to disk and accumulates
+document and term frequencies per bucket. ``finish()`` keeps the ``max_features`` most frequent
+buckets (as TfidfVectorizer does with terms), then applies idf and L2 normalization over the
+on-disk arrays in row chunks and returns a memory-mapped CSR matrix. Its columns are the kept
+buckets, so cluster centers stay ``k x max_features``. Peak memory is one batch plus two
+``n_features`` frequency vectors, independent of corpus size.
+
+Hashed columns have no names; ``bucket_terms`` recovers them from a small set of texts (e.g. a
+sample of cluster members) when keywords are needed.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+from .artifacts import load_array, load_json, run_dir, save_array, save_json
+from .tfidf import get_stopwords_for_locales
+
+DEFAULT_HASH_FEATURES = 2 ** 20
+
+
+def make_hashing_vectorizer(
+    n_features: int = DEFAULT_HASH_FEATURES,
+    use_stopwords: bool = True,
+    locales: Optional[Iterable[str]] = None,
+) -> HashingVectorizer:
+    # Same tokens as make_vectorizer, raw counts; idf and normalization come later.
+    return HashingVectorizer(
+        analyzer="word",
+        ngram_range=(1, 2),
+        token_pattern=r"(?u)\b[^\W\d_]{2,}\b",
+        stop_words=get_stopwords_for_locales(locales) if use_stopwords else None,
+        n_features=n_features,
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+
+
+def bucket_terms(hv: HashingVectorizer, texts: Iterable[str]) -> Dict[int, str]:
+    """Most frequent term in texts for every hash bucket they touch."""
+    analyzer = hv.build_analyzer()
+    counts: Counter = Counter()
+    for text in texts:
+        counts.update(analyzer(text))
+    names: Dict[int, str] = {}
+    for term, _ in counts.most_common():
+        names.setdefault(abs(murmurhash3_32(term, seed=0)) % hv.n_features, term)
+    return names
+
+
+class HashedTfidfWriter:
+    """Streams texts into ``<artifacts_dir>/<run_id>/<name>_{data,indices,indptr,idf,buckets}.npy``.
+
+    ``buckets[j]`` is the hash bucket behind matrix column j.
+    """
+
+    def __init__(
+        self,
+        base: str,
+        run_id: str,
+        name: str,
+        n_features: int = DEFAULT_HASH_FEATURES,
+        use_stopwords: bool = True,
+        locales: Optional[Iterable[str]] = None,
+        max_features: int = 30000,
+    ):
+        self.base, self.run_id, self.name = base, run_id, name
+        self.dir = run_dir(base, run_id)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.hv = make_hashing_vectorizer(n_features, use_stopwords, locales)
+        self.max_features = max_features
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.tf = np.zeros(n_features, dtype=np.float64)
+        self.buckets: Optional[np.ndarray] = None
+        self.n_rows = 0
+        self.nnz = 0
+        self.batches = 0
+        self._t0 = time.perf_counter()
+        self._raw = {part: open(self._raw_path(part), "wb") for part in ("data", "indices", "row_nnz")}
+
+    def _raw_path(self, part: str):
+        return self.dir / f"{self.name}_{part}.raw"
+
+    def add(self, texts: List[str]) -> None:
+        counts = self.hv.transform(texts)
+        counts.sum_duplicates()
+        self.df += np.bincount(counts.indices, minlength=self.df.shape[0])
+        self.tf += np.bincount(counts.indices, weights=counts.data, minlength=self.tf.shape[0])
+        counts.data.astype(np.float32).tofile(self._raw["data"])
+        counts.indices.astype(np.int32).tofile(self._raw["indices"])
+        np.diff(counts.indptr).astype(np.int64).tofile(self._raw["row_nnz"])
+        self.n_rows += counts.shape[0]
+        self.nnz += counts.nnz
+        self.batches += 1
+
+    def finish(self, chunk_rows: int = 20000):
+        """Trim to the top buckets, apply smooth idf and L2 row normalization on disk; returns the mmap CSR matrix."""
+        for f in self._raw.values():
+            f.close()
+        n, raw_nnz = self.n_rows, self.nnz
+        used = np.flatnonzero(self.tf > 0)
+        if self.max_features and len(used) > self.max_features:
+            # Most frequent first, ties to the lower bucket, then back to bucket order.
+            used = np.sort(used[np.lexsort((used, -self.tf[used]))[: self.max_features]])
+        self.buckets = used
+        column = np.full(self.df.shape[0], -1, dtype=np.int64)
+        column[used] = np.arange(len(used))
+        idf = (np.log((1 + n) / (1 + self.df[used])) + 1).astype(np.float32)
+
+        raw_row_nnz = np.fromfile(self._raw_path("row_nnz"), dtype=np.int64)
+        raw_indptr = np.concatenate([[0], np.cumsum(raw_row_nnz)])
+        raw_data = np.memmap(self._raw_path("data"), dtype=np.float32, mode="r", shape=(raw_nnz,)) if raw_nnz else np.zeros(0, np.float32)
+        raw_idx = np.memmap(self._raw_path("indices"), dtype=np.int32, mode="r", shape=(raw_nnz,)) if raw_nnz else np.zeros(0, np.int32)
+
+        def chunks():
+            for r0 in range(0, n, chunk_rows):
+                r1 = min(n, r0 + chunk_rows)
+                s, e = int(raw_indptr[r0]), int(raw_indptr[r1])
+                cols = column[np.asarray(raw_idx[s:e])]
+                keep = cols >= 0
+                rows = np.repeat(np.arange(r1 - r0), raw_row_nnz[r0:r1])[keep]
+                yield r0, r1, s, e, cols[keep], keep, rows
+
+        # Pass 1 over the indices: row lengths after trimming, so the output can be preallocated.
+        row_nnz = np.zeros(n, dtype=np.int64)
+        for r0, r1, _, _, _, _, rows in chunks():
+            row_nnz[r0:r1] = np.bincount(rows, minlength=r1 - r0)
+        nnz = int(row_nnz.sum())
+        idx_dtype = np.int32 if nnz < 2 ** 31 else np.int64
+        indptr = np.concatenate([[0], np.cumsum(row_nnz)]).astype(idx_dtype)
+        data = open_memmap(self.dir / f"{self.name}_data.tmp.npy", mode="w+", dtype=np.float32, shape=(nnz,))
+        indices = open_memmap(self.dir / f"{self.name}_indices.tmp.npy", mode="w+", dtype=idx_dtype, shape=(nnz,))
+        for r0, r1, s, e, cols, keep, rows in chunks():
+            w = np.asarray(raw_data[s:e])[keep] * idf[cols]
+            norms = np.sqrt(np.bincount(rows, weights=w.astype(np.float64) ** 2, minlength=r1 - r0))
+            o0, o1 = int(indptr[r0]), int(indptr[r1])
+            data[o0:o1] = w / np.maximum(norms[rows], 1e-12)
+            indices[o0:o1] = cols
+        data.flush()
+        indices.flush()
+        del data, indices, raw_data, raw_idx
+        for part in ("data", "indices"):
+            (self.dir / f"{self.name}_{part}.tmp.npy").replace(self.dir / f"{self.name}_{part}.npy")
+        for part in ("data", "indices", "row_nnz"):
+            self._raw_path(part).unlink()
+        save_array(self.base, self.run_id, f"{self.name}_indptr", indptr)
+        save_array(self.base, self.run_id, f"{self.name}_idf", idf)
+        save_array(self.base, self.run_id, f"{self.name}_buckets", used)
+        self.stats = {
+            "vectorizer": "hashed",
+            "n_features": self.df.shape[0],
+            "used_buckets": int((self.df > 0).sum()),
+            "columns": len(used),
+            "rows": n,
+            "nnz": nnz,
+            "batches": self.batches,
+            "seconds": round(time.perf_counter() - self._t0, 3),
+        }
+        save_json(self.base, self.run_id, f"{self.name}_meta", {**self.stats, "shape": [n, len(used)]})
+        return load_hashed_tfidf(self.base, self.run_id, self.name)
+
+
+def load_hashed_tfidf(base: str, run_id: str, name: str):
+    """Memory-mapped CSR matrix written by HashedTfidfWriter, or None."""
+    meta = load_json(base, run_id, f"{name}_meta")
+    parts = [load_array(base, run_id, f"{name}_{p}") for p in ("data", "indices", "indptr")]
+    if meta is None or any(p is None for p in parts):
+        return None
+    return sparse.csr_matrix(tuple(parts), shape=tuple(meta["shape"]), copy=False)
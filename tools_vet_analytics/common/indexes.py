@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from .mongo import assert_safe_write_target
+
+logger = logging.getLogger("vet_analytics")
+
+IndexKeys = List[Tuple[str, int]]
+
+# Every output collection is read by run_id and upserted on (key_field, run_id);
+# equality on both fields lets one compound index serve both access paths.
+REQUIRED_INDEXES: Dict[str, List[IndexKeys]] = {
+    "inv_inventory": [
+        [("run_id", 1), ("inventory_id", 1)],
+        [("collection", 1), ("fingerprint.hash", 1), ("created_at", -1)],
+    ],
+    "inv_samples": [
+        [("run_id", 1), ("sample_id", 1)],
+        [("run_id", 1), ("collection", 1)],
+    ],
+    "dedup_groups": [
+        [("run_id", 1), ("dedup_id", 1)],
+        [("run_id", 1), ("dedup_type", 1)],
+    ],
+    "dedup_members": [
+        [("run_id", 1), ("member_id", 1)],
+        [("run_id", 1), ("source_collection", 1)],
+    ],
+    "evidence_blocks": [
+        [("run_id", 1), ("block_id", 1)],
+        [("run_id", 1), ("source_collection", 1)],
+    ],
+    "kb_concepts": [[("run_id", 1), ("concept_id", 1)]],
+    "kb_atoms": [
+        [("run_id", 1), ("atom_id", 1)],
+        [("run_id", 1), ("concept_id", 1), ("atom_type", 1)],
+    ],
+    "qa_units": [[("run_id", 1), ("qa_unit_id", 1)]],
+    "qa_eval": [[("run_id", 1)]],
+    "run_reports": [[("run_id", 1), ("report_id", 1)]],
+    "ingest_watermarks": [
+        [("run_id", 1), ("watermark_id", 1)],
+        [("collection", 1), ("content_field", 1), ("field", 1), ("created_at", -1)],
+    ],
+}
+
+
+def _existing_key_patterns(collection) -> set[Tuple[Tuple[str, Any], ...]]:
+    out = set()
+    for ix in collection.list_indexes():
+        out.add(tuple((k, v) for k, v in ix["key"].items()))
+    return out
+
+
+def ensure_indexes(write_db, dry_run: bool = False) -> List[Dict[str, Any]]:
+    report: List[Dict[str, Any]] = []
+    t_all = time.perf_counter()
+    for coll_name, specs in REQUIRED_INDEXES.items():
+        coll = write_db[coll_name]
+        assert_safe_write_target(coll)
+        existing = _existing_key_patterns(coll)
+        for keys in specs:
+            entry: Dict[str, Any] = {"collection": coll_name, "keys": [list(k) for k in keys], "status": "exists", "seconds": 0.0}
+            if tuple(keys) not in existing:
+                if dry_run:
+                    entry["status"] = "missing"
+                else:
+                    t0 = time.perf_counter()
+                    entry["name"] = coll.create_index(keys)
+                    entry["seconds"] = round(time.perf_counter() - t0, 3)
+                    entry["status"] = "created"
+                    logger.info("Created index %s on %s in %.2fs", entry["name"], coll_name, entry["seconds"])
+            report.append(entry)
+    created = [e for e in report if e["status"] == "created"]
+    logger.info(
+        "Index check: %d required, %d created, %d missing (dry run), %.2fs total",
+        len(report),
+        len(created),
+        sum(1 for e in report if e["status"] == "missing"),
+        time.perf_counter() - t_all,
+    )
+    return report
@@ -0,0 +1,118 @@
+"""Batched stopword-based language identification with a persistent result cache.
+
+Scores are stopword hit counts per locale, computed for a whole batch as one sparse
+product: token counts (docs x stopword vocabulary) @ membership (vocabulary x locales).
+This reproduces the per-document heuristic exactly: the text is cut to its first
+``sample_chars`` characters and lowercased, the first locale with the highest score
+wins ties, and scores below ``threshold`` give "und".
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from .tfidf import load_stopwords_by_locale
+
+UNDETERMINED = "und"
+
+
+class LanguageIdentifier:
+    def __init__(
+        self,
+        locales: Sequence[str] = ("ru", "pt", "sw"),
+        threshold: int = 5,
+        sample_chars: int = 1500,
+        cache_path: str = "",
+    ):
+        by_loc = load_stopwords_by_locale()
+        self.locales = list(locales)
+        self.threshold = threshold
+        self.sample_chars = sample_chars
+        vocab = sorted(set().union(*(by_loc.get(loc, frozenset()) for loc in self.locales)))
+        index = {w: i for i, w in enumerate(vocab)}
+        rows, cols = [], []
+        for j, loc in enumerate(self.locales):
+            for w in by_loc.get(loc, frozenset()):
+                rows.append(index[w])
+                cols.append(j)
+        self._membership = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(vocab), len(self.locales))
+        )
+        self._vectorizer = CountVectorizer(vocabulary=index, analyzer=str.split, lowercase=False, dtype=np.int32)
+        # Cached results are only valid for the same stopword lists and decision rule.
+        sig = "|".join([",".join(self.locales), str(threshold), str(sample_chars), *vocab]).encode("utf-8")
+        self.model_id = hashlib.sha1(sig).hexdigest()[:16]
+
+        self._memo: Dict[str, str] = {}
+        self.memo_limit = 200_000
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_path:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS langid (model TEXT, text_hash TEXT, locale TEXT, PRIMARY KEY (model, text_hash))")
+            self._db.commit()
+        self.stats = {"detected": 0, "cache_hits": 0}
+
+    def _sample(self, text: str) -> str:
+        return (text or "")[: self.sample_chars].lower()
+
+    def scores(self, samples: List[str]) -> np.ndarray:
+        counts = self._vectorizer.transform(samples)
+        return np.asarray((counts @ self._membership).todense())
+
+    def _decide(self, samples: List[str]) -> List[str]:
+        if not samples:
+            return []
+        sc = self.scores(samples)
+        best = sc.argmax(axis=1)
+        top = sc[np.arange(len(samples)), best]
+        return [self.locales[b] if t >= self.threshold else UNDETERMINED for b, t in zip(best, top)]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, str]:
+        found = {k: self._memo[k] for k in keys if k in self._memo}
+        missing = [k for k in keys if k not in found]
+        if self._db is not None and missing:
+            with self._lock:
+                for i in range(0, len(missing), 500):
+                    part = missing[i:i + 500]
+                    marks = ",".join("?" * len(part))
+                    for k, loc in self._db.execute(
+                        f"SELECT text_hash, locale FROM langid WHERE model = ? AND text_hash IN ({marks})", [self.model_id, *part]
+                    ):
+                        found[k] = loc
+        return found
+
+    def detect_many(self, texts: Sequence[str]) -> List[str]:
+        samples = [self._sample(t) for t in texts]
+        keys = [hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest() for s in samples]
+        known = self._lookup(list(dict.fromkeys(keys)))
+        todo = {}
+        for k, s in zip(keys, samples):
+            if k not in known and k not in todo:
+                todo[k] = s
+        fresh = dict(zip(todo, self._decide(list(todo.values()))))
+        self.stats["detected"] += len(fresh)
+        self.stats["cache_hits"] += sum(1 for k in keys if k in known)
+        if len(self._memo) > self.memo_limit:
+            self._memo.clear()
+        self._memo.update(known)
+        self._memo.update(fresh)
+        if self._db is not None and fresh:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO langid (model, text_hash, locale) VALUES (?, ?, ?)",
+                    [(self.model_id, k, loc) for k, loc in fresh.items()],
+                )
+                self._db.commit()
+        return [fresh.get(k) or known[k] for k in keys]
+
+    def detect(self, text: str) -> str:
+        return self.detect_many([text])[0]
@@ -0,0 +1,447 @@
+"""Embedded SQLite storage with the subset of the pymongo API the pipeline uses.
+
+Each database is one SQLite file under the store directory and each collection
+is a table of ``(id, doc)`` rows, with documents serialized as extended JSON.
+Scalar equality filters are pushed down to SQL (and can use indexes created via
+``create_index``), so unlike MongoDB they do not match elements of array fields;
+every other filter operator is evaluated in Python after the fetch. Only
+``$set`` updates are supported.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId, json_util
+from pymongo.errors import OperationFailure
+
+_MISSING = object()
+_FETCH_ROWS = 500
+
+
+class UpsertRequest(NamedTuple):
+    """One update for ``bulk_write``; ``common.mongo.upsert_ops`` turns it into ``UpdateOne`` for pymongo."""
+
+    filter: Dict[str, Any]
+    update: Dict[str, Any]
+    upsert: bool = True
+
+
+def _dumps(value: Any) -> str:
+    return json_util.dumps(value, sort_keys=False)
+
+
+def _loads(text: str) -> Any:
+    return json_util.loads(text)
+
+
+def _table(name: str) -> str:
+    return '"c_' + name.replace('"', '""') + '"'
+
+
+def _json_path(field: str) -> str:
+    return "$" + "".join('."' + part.replace('"', '\\"') + '"' for part in field.split("."))
+
+
+def _sql_expr(field: str) -> str:
+    if field == "_id":
+        return "id"
+    return f"json_extract(doc, '{_json_path(field)}')"
+
+
+def _resolve(doc: Any, path: str) -> Any:
+    cur = doc
+    for part in path.split("."):
+        if isinstance(cur, dict):
+            cur = cur.get(part, _MISSING)
+        elif isinstance(cur, list) and part.isdigit():
+            idx = int(part)
+            cur = cur[idx] if idx < len(cur) else _MISSING
+        else:
+            return _MISSING
+        if cur is _MISSING:
+            return _MISSING
+    return cur
+
+
+def _compare(a: Any, b: Any, op: str) -> bool:
+    try:
+        if op == "$gt":
+            return a > b
+        if op == "$gte":
+            return a >= b
+        if op == "$lt":
+            return a < b
+        return a <= b
+    except TypeError:
+        return False
+
+
+def _value_matches(value: Any, cond: Any) -> bool:
+    if isinstance(cond, dict) and cond and all(str(k).startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$exists":
+                if (value is not _MISSING) != bool(arg):
+                    return False
+            elif op == "$eq":
+                if not _value_matches(value, arg):
+                    return False
+            elif op == "$ne":
+                if _value_matches(value, arg):
+                    return False
+            elif op == "$in":
+                if not any(_value_matches(value, x) for x in arg):
+                    return False
+            elif op == "$nin":
+                if any(_value_matches(value, x) for x in arg):
+                    return False
+            elif op in {"$gt", "$gte", "$lt", "$lte"}:
+                candidates = value if isinstance(value, list) else [value]
+                if value is _MISSING or not any(_compare(v, arg, op) for v in candidates):
+                    return False
+            else:
+                raise OperationFailure(f"Operator {op} is not supported by the local storage backend")
+        return True
+    if value is _MISSING:
+        return cond is None
+    if isinstance(value, list) and not isinstance(cond, list):
+        return cond in value
+    return value == cond
+
+
+def _matches(doc: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    for key, cond in (flt or {}).items():
+        if key == "$and":
+            if not all(_matches(doc, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif not _value_matches(_resolve(doc, key), cond):
+            return False
+    return True
+
+
+def _pushdown(flt: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, cond in (flt or {}).items():
+        if key.startswith("$"):
+            continue
+        if key == "_id":
+            if isinstance(cond, dict) and set(cond) == {"$in"}:
+                ids = [_dumps(v) for v in cond["$in"]]
+                if not ids:
+                    return "0", []
+                clauses.append(f"id IN ({','.join('?' * len(ids))})")
+                params.extend(ids)
+            elif not isinstance(cond, dict):
+                clauses.append("id = ?")
+                params.append(_dumps(cond))
+        elif isinstance(cond, (str, int, float)) and not isinstance(cond, bool):
+            clauses.append(f"{_sql_expr(key)} = ?")
+            params.append(cond)
+    return (" AND ".join(clauses) or "1"), params
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return doc
+    include_id = bool(projection.get("_id", 1))
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(not v for v in fields.values()):
+        out = {k: v for k, v in doc.items() if k not in fields}
+        if not include_id:
+            out.pop("_id", None)
+        return out
+    out: Dict[str, Any] = {}
+    if include_id and "_id" in doc:
+        out["_id"] = doc["_id"]
+    for field in fields:
+        parts = field.split(".")
+        val = _resolve(doc, field)
+        if val is _MISSING:
+            continue
+        cur = out
+        for part in parts[:-1]:
+            cur = cur.setdefault(part, {})
+        cur[parts[-1]] = val
+    return out
+
+
+def _sorted(docs: List[Dict[str, Any]], spec: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    for field, direction in reversed(spec):
+        present = [d for d in docs if _resolve(d, field) not in (_MISSING, None)]
+        absent = [d for d in docs if _resolve(d, field) in (_MISSING, None)]
+        try:
+            present.sort(key=lambda d: _resolve(d, field), reverse=direction < 0)
+        except TypeError:
+            present.sort(key=lambda d: str(_resolve(d, field)), reverse=direction < 0)
+        docs = present + absent if direction < 0 else absent + present
+    return docs
+
+
+def _normalize_sort(key_or_list: Any, direction: int = 1) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction)]
+    return [(k, d) for k, d in key_or_list]
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    for op, fields in update.items():
+        if op != "$set":
+            raise OperationFailure(f"Update operator {op} is not supported by the local storage backend")
+        for path, val in fields.items():
+            parts = path.split(".")
+            cur = doc
+            for part in parts[:-1]:
+                cur = cur.setdefault(part, {})
+            cur[parts[-1]] = val
+    return doc
+
+
+class LocalCursor:
+    def __init__(self, collection: "LocalCollection", flt, projection, limit: int = 0, sort=None):
+        self._collection = collection
+        self._filter = flt or {}
+        self._projection = projection
+        self._limit = limit or 0
+        self._sort = _normalize_sort(sort) if sort else None
+
+    def limit(self, n: int) -> "LocalCursor":
+        self._limit = n or 0
+        return self
+
+    def sort(self, key_or_list, direction: int = 1) -> "LocalCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def batch_size(self, n: int) -> "LocalCursor":
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        docs: Iterable[Dict[str, Any]] = self._collection._iter_matching(self._filter)
+        if self._sort:
+            docs = _sorted(list(docs), self._sort)
+        n = 0
+        for doc in docs:
+            if self._limit and n >= self._limit:
+                break
+            n += 1
+            yield _project(doc, self._projection)
+
+
+class LocalCollection:
+    def __init__(self, database: "LocalDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+
+    def _ensure(self) -> None:
+        self.database._ensure_table(self.name)
+
+    def _iter_matching(self, flt: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if self.name not in self.database.list_collection_names():
+            return
+        where, params = _pushdown(flt)
+        db = self.database
+        with db._lock:
+            cur = db._conn.execute(f"SELECT doc FROM {_table(self.name)} WHERE {where} ORDER BY rowid", params)
+            rows = cur.fetchmany(_FETCH_ROWS)
+        while rows:
+            for (text,) in rows:
+                doc = _loads(text)
+                if _matches(doc, flt):
+                    yield doc
+            with db._lock:
+                rows = cur.fetchmany(_FETCH_ROWS)
+
+    def find(self, filter=None, projection=None, limit: int = 0, sort=None, **kwargs) -> LocalCursor:
+        return LocalCursor(self, filter, projection, limit=limit, sort=sort)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs) -> Optional[Dict[str, Any]]:
+        for doc in LocalCursor(self, filter, projection, limit=1, sort=sort):
+            return doc
+        return None
+
+    def count_documents(self, filter=None, **kwargs) -> int:
+        return sum(1 for _ in self._iter_matching(filter or {}))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        if self.name not in self.database.list_collection_names():
+            return 0
+        with self.database._lock:
+            return int(self.database._conn.execute(f"SELECT COUNT(*) FROM {_table(self.name)}").fetchone()[0])
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        doc.setdefault("_id", ObjectId())
+        self.database._conn.execute(
+            f"INSERT OR REPLACE INTO {_table(self.name)} (id, doc) VALUES (?, ?)", (_dumps(doc["_id"]), _dumps(doc))
+        )
+        return doc["_id"]
+
+    def _update_one(self, flt: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> Tuple[int, int, Any]:
+        existing = next(self._iter_matching(flt), None)
+        if existing is None:
+            if not upsert:
+                return 0, 0, None
+            seed = {k: v for k, v in flt.items() if not k.startswith("$") and not isinstance(v, dict)}
+            return 0, 0, self._insert(_apply_update(seed, update))
+        before = _dumps(existing)
+        after = _dumps(_apply_update(existing, update))
+        if after != before:
+            self.database._conn.execute(
+                f"UPDATE {_table(self.name)} SET doc = ? WHERE id = ?", (after, _dumps(existing["_id"]))
+            )
+            return 1, 1, None
+        return 1, 0, None
+
+    def insert_one(self, doc: Dict[str, Any]):
+        self._ensure()
+        with self.database._transaction():
+            inserted = self._insert(doc)
+        return _Result(inserted_id=inserted)
+
+    def insert_many(self, docs: Iterable[Dict[str, Any]], ordered: bool = True):
+        self._ensure()
+        with self.database._transaction():
+            ids = [self._insert(d) for d in docs]
+        return _Result(inserted_ids=ids)
+
+    def update_one(self, filter, update, upsert: bool = False):
+        self._ensure()
+        with self.database._transaction():
+            matched, modified, upserted_id = self._update_one(filter, update, upsert)
+        return _Result(matched_count=matched, modified_count=modified, upserted_id=upserted_id)
+
+    def bulk_write(self, requests: Iterable[UpsertRequest], ordered: bool = True):
+        self._ensure()
+        matched = modified = upserted = 0
+        with self.database._transaction():
+            for req in requests:
+                m, mod, up = self._update_one(req.filter, req.update, req.upsert)
+                matched += m
+                modified += mod
+                upserted += 1 if up is not None else 0
+        return _Result(matched_count=matched, modified_count=modified, upserted_count=upserted)
+
+    def delete_many(self, filter):
+        if self.name not in self.database.list_collection_names():
+            return _Result(deleted_count=0)
+        ids = [_dumps(d["_id"]) for d in self._iter_matching(filter or {})]
+        with self.database._transaction():
+            for i in range(0, len(ids), _FETCH_ROWS):
+                part = ids[i : i + _FETCH_ROWS]
+                self.database._conn.execute(
+                    f"DELETE FROM {_table(self.name)} WHERE id IN ({','.join('?' * len(part))})", part
+                )
+        return _Result(deleted_count=len(ids))
+
+    def create_index(self, keys, **kwargs) -> str:
+        self._ensure()
+        spec = _normalize_sort(keys)
+        name = "_".join(f"{k}_{d}" for k, d in spec)
+        sql_name = '"ix_' + re.sub(r"[^0-9A-Za-z_]", "_", f"{self.name}__{name}") + '"'
+        cols = ", ".join(_sql_expr(k) for k, _ in spec)
+        with self.database._transaction():
+            self.database._conn.execute(f"CREATE INDEX IF NOT EXISTS {sql_name} ON {_table(self.name)} ({cols})")
+            self.database._conn.execute(
+                "INSERT OR REPLACE INTO _indexes (coll, name, keys) VALUES (?, ?, ?)", (self.name, name, json.dumps(spec))
+            )
+        return name
+
+    def list_indexes(self):
+        out = [{"name": "_id_", "key": {"_id": 1}}]
+        with self.database._lock:
+            rows = self.database._conn.execute("SELECT name, keys FROM _indexes WHERE coll = ?", (self.name,)).fetchall()
+        for name, keys in rows:
+            out.append({"name": name, "key": {k: d for k, d in json.loads(keys)}})
+        return iter(out)
+
+    def aggregate(self, pipeline, **kwargs):
+        raise OperationFailure("Aggregation pipelines are not supported by the local storage backend")
+
+
+class _Result:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Transaction:
+    def __init__(self, db: "LocalDatabase"):
+        self.db = db
+
+    def __enter__(self):
+        self.db._lock.acquire()
+        self.db._conn.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db._lock.release()
+
+
+class LocalDatabase:
+    def __init__(self, client: "LocalClient", name: str):
+        self.client = client
+        self.name = name
+        self._lock = threading.RLock()
+        path = client.root / f"{name}.sqlite"
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS _collections (name TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS _indexes (coll TEXT, name TEXT, keys TEXT, PRIMARY KEY (coll, name))")
+        self._names = {r[0] for r in self._conn.execute("SELECT name FROM _collections")}
+
+    def _transaction(self) -> _Transaction:
+        return _Transaction(self)
+
+    def _ensure_table(self, name: str) -> None:
+        if name in self._names:
+            return
+        with self._lock:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {_table(name)} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO _collections (name) VALUES (?)", (name,))
+            self._names.add(name)
+
+    def __getitem__(self, name: str) -> LocalCollection:
+        return LocalCollection(self, name)
+
+    def __getattr__(self, name: str) -> LocalCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return sorted(self._names)
+
+    def command(self, name, *args, **kwargs):
+        raise OperationFailure(f"Command {name} is not supported by the local storage backend")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LocalClient:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._dbs: Dict[str, LocalDatabase] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> LocalDatabase:
+        with self._lock:
+            if name not in self._dbs:
+                self._dbs[name] = LocalDatabase(self, name)
+            return self._dbs[name]
+
+    def close(self) -> None:
+        for db in self._dbs.values():
+            db.close()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_MAX_HASH = np.uint32((1 << 31) - 1)
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    # Word k-shingles hashed with crc32; texts shorter than k words become one shingle.
+    words = text.split()
+    if len(words) <= k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)))
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows <= num_perm whose S-curve midpoint is closest to threshold."""
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.randint(1, int(_MERSENNE), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.randint(0, int(_MERSENNE), size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> np.ndarray:
+        sh = shingle_hashes(text, self.shingle_size)
+        if sh.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # a < 2^31 and crc32 < 2^32, so a * h + b stays below 2^64.
+        return ((self._a * sh[None, :] + self._b) % _MERSENNE).min(axis=1).astype(np.uint32)
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class NearDupIndex:
+    """Banded LSH over MinHash signatures with union-find grouping.
+
+    Each band bucket remembers only its first member (the leader), so an item is
+    compared with at most ``bands`` earlier items instead of every item in the bucket.
+    Candidates are verified on the full signature before they are merged.
+    """
+
+    def __init__(self, num_perm: int = 64, threshold: float = 0.8, shingle_size: int = 5):
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self.keys: List[str] = []
+        self.signatures: List[np.ndarray] = []
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(self.bands)]
+        self._parent: List[int] = []
+
+    def _find(self, i: int) -> int:
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+
+    def _union(self, i: int, j: int) -> None:
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            # Lower index wins so the first-seen item stays the group representative.
+            lo, hi = (ri, rj) if ri < rj else (rj, ri)
+            self._parent[hi] = lo
+
+    def add(self, key: str, text: str) -> None:
+        sig = self.hasher.signature(text)
+        i = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(sig)
+        self._parent.append(i)
+        for b in range(self.bands):
+            band = sig[b * self.rows:(b + 1) * self.rows].tobytes()
+            leader = self._buckets[b].setdefault(band, i)
+            if leader != i and self._find(leader) != self._find(i):
+                if estimate_jaccard(sig, self.signatures[leader]) >= self.threshold:
+                    self._union(i, leader)
+
+    def groups(self) -> List[List[Tuple[str, float]]]:
+        """Groups with at least two members as [(key, estimated similarity to the representative)]."""
+        members = defaultdict(list)
+        for i in range(len(self.keys)):
+            members[self._find(i)].append(i)
+        out = []
+        for root, idx in members.items():
+            if len(idx) < 2:
+                continue
+            rep = self.signatures[root]
+            out.append([(self.keys[i], estimate_jaccard(self.signatures[i], rep)) for i in sorted(idx)])
+        return out
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import json
+import logging
+import time
 import urllib.parse
 import urllib.request
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from pymongo.collection import Collection
-from pymongo.errors import ConfigurationError
+from pymongo.errors import BulkWriteError, ConfigurationError, PyMongoError
+
+from .local_store import LocalClient, LocalCollection, UpsertRequest
 
 
 @dataclass
@@ -21,6 +26,56 @@ class MongoBundle:
 
 REQUIRED_WRITE_DB = "vet_analytics"
 
+logger = logging.getLogger("vet_analytics")
+
+
+@dataclass
+class UpsertBatchResult:
+    batch_index: int
+    size: int
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class UpsertReport:
+    collection: str
+    batches: List[UpsertBatchResult] = field(default_factory=list)
+
+    @property
+    def skipped(self) -> int:
+        return sum(b.skipped for b in self.batches)
+
+    @property
+    def error_count(self) -> int:
+        return sum(len(b.errors) for b in self.batches)
+
+    def summary(self) -> Dict[str, Any]:
+        out = self.to_dict()
+        out.pop("batches")
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "batch_count": len(self.batches),
+            "docs": sum(b.size for b in self.batches),
+            "matched": sum(b.matched for b in self.batches),
+            "modified": sum(b.modified for b in self.batches),
+            "upserted": sum(b.upserted for b in self.batches),
+            "skipped_unchanged": self.skipped,
+            "seconds": round(sum(b.seconds for b in self.batches), 3),
+            "error_count": self.error_count,
+            "batches": [asdict(b) for b in self.batches],
+        }
+
+
+_CLIENTS: Dict[tuple, MongoClient] = {}
+
 
 def _dns_json_resolve(name: str, rtype: str) -> Dict[str, Any]:
     url = f"https://dns.google/resolve?name={urllib.parse.quote(name)}&type={rtype}"
@@ -28,14 +83,43 @@ def _dns_json_resolve(name: str, rtype: str) -> Dict[str, Any]:
         return json.loads(resp.read().decode("utf-8"))
 
 
-def _srv_to_direct_uri(uri: str) -> str:
-    parsed = urllib.parse.urlparse(uri)
-    if parsed.scheme != "mongodb+srv":
-        return uri
+def _load_srv_cache(cache_path: str) -> Dict[str, Any]:
+    if not cache_path:
+        return {}
+    try:
+        return json.loads(Path(cache_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _cached_srv_entry(base_host: str, cache_path: str, ttl_s: int) -> Optional[Dict[str, Any]]:
+    if not cache_path or ttl_s <= 0:
+        return None
+    entry = _load_srv_cache(cache_path).get(base_host)
+    if not entry or time.time() - float(entry.get("resolved_at", 0)) > ttl_s:
+        return None
+    return entry
+
+
+def _store_srv_entry(base_host: str, entry: Dict[str, Any], cache_path: str) -> None:
+    if not cache_path:
+        return
+    data = _load_srv_cache(cache_path)
+    data[base_host] = entry
+    fp = Path(cache_path)
+    try:
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp = fp.with_suffix(fp.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        tmp.replace(fp)
+    except OSError as exc:
+        logger.warning("Could not write SRV cache %s: %s", cache_path, exc)
 
-    base_host = parsed.hostname or ""
-    if not base_host:
-        return uri
+
+def _resolve_srv(base_host: str, cache_path: str = "", ttl_s: int = 0) -> Dict[str, Any]:
+    cached = _cached_srv_entry(base_host, cache_path, ttl_s)
+    if cached is not None:
+        return cached
 
     srv = _dns_json_resolve(f"_mongodb._tcp.{base_host}", "SRV")
     answers = srv.get("Answer", [])
@@ -46,7 +130,7 @@ def _srv_to_direct_uri(uri: str) -> str:
             hosts.append(parts[3].rstrip("."))
     hosts = sorted(set(hosts))
     if not hosts:
-        return uri
+        return {"hosts": [], "txt": ""}
 
     txt = _dns_json_resolve(base_host, "TXT")
     txt_answer = txt.get("Answer", [])
@@ -54,6 +138,33 @@ def _srv_to_direct_uri(uri: str) -> str:
     if txt_answer:
         txt_opts = str(txt_answer[0].get("data", "")).strip('"')
 
+    # Only hosts and TXT options are cached; credentials stay in the URI and never touch disk.
+    entry = {"hosts": hosts, "txt": txt_opts, "resolved_at": time.time()}
+    if ttl_s > 0:
+        _store_srv_entry(base_host, entry, cache_path)
+    return entry
+
+
+def _srv_to_direct_uri(uri: str, cache_path: str = "", ttl_s: int = 0, cached_only: bool = False) -> str:
+    parsed = urllib.parse.urlparse(uri)
+    if parsed.scheme != "mongodb+srv":
+        return uri
+
+    base_host = parsed.hostname or ""
+    if not base_host:
+        return uri
+
+    if cached_only:
+        resolved = _cached_srv_entry(base_host, cache_path, ttl_s)
+        if resolved is None:
+            return uri
+    else:
+        resolved = _resolve_srv(base_host, cache_path, ttl_s)
+    hosts = resolved.get("hosts") or []
+    if not hosts:
+        return uri
+    txt_opts = resolved.get("txt") or ""
+
     existing_q = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
     existing_keys = {k for k, _ in existing_q}
 
@@ -76,57 +187,262 @@ def _srv_to_direct_uri(uri: str) -> str:
     return f"mongodb://{user}{','.join(hosts)}/?{query}"
 
 
-def _make_client(uri: str) -> MongoClient:
+def _open_client(uri: str, max_pool_size: int, timeout_ms: int, socket_timeout_ms: int) -> MongoClient:
+    client = MongoClient(
+        uri,
+        maxPoolSize=max_pool_size,
+        serverSelectionTimeoutMS=timeout_ms,
+        socketTimeoutMS=socket_timeout_ms or None,
+    )
     try:
-        client = MongoClient(uri, serverSelectionTimeoutMS=10000)
         client.admin.command("ping")
-        return client
+    except Exception:
+        client.close()
+        raise
+    return client
+
+
+def _make_client(
+    uri: str,
+    max_pool_size: int = 100,
+    timeout_ms: int = 10000,
+    socket_timeout_ms: int = 0,
+    srv_cache_path: str = "",
+    srv_cache_ttl_s: int = 0,
+) -> MongoClient:
+    key = (uri, max_pool_size, timeout_ms, socket_timeout_ms)
+    if key in _CLIENTS:
+        return _CLIENTS[key]
+
+    # A fresh cache entry means the SRV lookup failed last time; go straight to the direct hosts.
+    cached_uri = _srv_to_direct_uri(uri, srv_cache_path, srv_cache_ttl_s, cached_only=True)
+    if cached_uri != uri:
+        try:
+            _CLIENTS[key] = _open_client(cached_uri, max_pool_size, timeout_ms, socket_timeout_ms)
+            return _CLIENTS[key]
+        except PyMongoError as exc:
+            logger.warning("Cached direct Mongo hosts failed (%s); resolving again", exc)
+
+    try:
+        client = _open_client(uri, max_pool_size, timeout_ms, socket_timeout_ms)
     except ConfigurationError as exc:
         msg = str(exc).lower()
-        if "dns query" in msg or "nxdomain" in msg:
-            direct_uri = _srv_to_direct_uri(uri)
-            if direct_uri != uri:
-                client = MongoClient(direct_uri, serverSelectionTimeoutMS=10000)
-                client.admin.command("ping")
-                return client
-        raise
+        if "dns query" not in msg and "nxdomain" not in msg:
+            raise
+        direct_uri = _srv_to_direct_uri(uri, srv_cache_path, srv_cache_ttl_s)
+        if direct_uri == uri:
+            raise
+        client = _open_client(direct_uri, max_pool_size, timeout_ms, socket_timeout_ms)
+    _CLIENTS[key] = client
+    return client
 
 
-def connect_mongo(uri_read: str, uri_write: str, db_read: str, db_write: str) -> MongoBundle:
+def connect_mongo(
+    uri_read: str,
+    uri_write: str,
+    db_read: str,
+    db_write: str,
+    max_pool_size: int = 100,
+    timeout_ms: int = 10000,
+    socket_timeout_ms: int = 0,
+    srv_cache_path: str = "",
+    srv_cache_ttl_s: int = 0,
+) -> MongoBundle:
     if db_write != REQUIRED_WRITE_DB:
         raise RuntimeError(f"Write DB must be {REQUIRED_WRITE_DB}, got {db_write}")
 
-    read_client = _make_client(uri_read)
-    write_client = _make_client(uri_write)
+    opts = {
+        "max_pool_size": max_pool_size,
+        "timeout_ms": timeout_ms,
+        "socket_timeout_ms": socket_timeout_ms,
+        "srv_cache_path": srv_cache_path,
+        "srv_cache_ttl_s": srv_cache_ttl_s,
+    }
+    read_client = _make_client(uri_read, **opts)
+    write_client = read_client if uri_write == uri_read else _make_client(uri_write, **opts)
     read_db_obj = read_client[db_read]
     write_db_obj = write_client[db_write]
     return MongoBundle(read_client, write_client, read_db_obj, write_db_obj)
 
 
+def connect_from_config(cfg) -> MongoBundle:
+    opts = {
+        "max_pool_size": cfg.mongo_max_pool_size,
+        "timeout_ms": cfg.mongo_timeout_ms,
+        "socket_timeout_ms": cfg.mongo_socket_timeout_ms,
+        "srv_cache_path": cfg.srv_cache_path,
+        "srv_cache_ttl_s": cfg.srv_cache_ttl_s,
+    }
+    if cfg.source_backend == "mongo" and cfg.storage_backend == "mongo":
+        return connect_mongo(cfg.mongo_uri_read, cfg.mongo_uri_write, cfg.mongo_db_read, cfg.mongo_db_write, **opts)
+
+    if cfg.mongo_db_write != REQUIRED_WRITE_DB:
+        raise RuntimeError(f"Write DB must be {REQUIRED_WRITE_DB}, got {cfg.mongo_db_write}")
+    local = LocalClient(cfg.local_store_dir)
+    read_client = local if cfg.source_backend == "local" else _make_client(cfg.mongo_uri_read, **opts)
+    write_client = local if cfg.storage_backend == "local" else _make_client(cfg.mongo_uri_write, **opts)
+    return MongoBundle(read_client, write_client, read_client[cfg.mongo_db_read], write_client[cfg.mongo_db_write])
+
+
 def assert_safe_write_target(collection: Collection) -> None:
     db_name = collection.database.name
     if db_name != REQUIRED_WRITE_DB:
         raise RuntimeError(f"Refusing to write outside {REQUIRED_WRITE_DB}: {db_name}")
 
 
+def upsert_requests(batch: Dict[Any, Dict[str, Any]], key_field: str, run_id: str) -> List[UpsertRequest]:
+    return [UpsertRequest({key_field: key_val, "run_id": run_id}, {"$set": doc}) for key_val, doc in batch.items()]
+
+
+def upsert_ops(batch: Dict[Any, Dict[str, Any]], key_field: str, run_id: str, collection: Any = None) -> List[Any]:
+    """bulk_write ops for collection: UpdateOne for pymongo, the UpsertRequest tuples for the local backend."""
+    requests = upsert_requests(batch, key_field, run_id)
+    if isinstance(collection, LocalCollection):
+        return requests
+    return [UpdateOne(r.filter, r.update, upsert=r.upsert) for r in requests]
+
+
+def iter_upsert_batches(docs: Iterable[Dict[str, Any]], key_field: str, batch_size: int):
+    """Yield (batch, n_docs) where batch maps key -> merged doc.
+
+    Unordered bulk ops give no ordering guarantee within a batch, so repeated
+    keys are merged up front to keep the sequential $set result.
+    """
+    batch: Dict[Any, Dict[str, Any]] = {}
+    n = 0
+    for doc in docs:
+        key_val = doc.get(key_field)
+        if key_val is None:
+            continue
+        if key_val in batch:
+            batch[key_val] = {**batch[key_val], **doc}
+        else:
+            batch[key_val] = doc
+        n += 1
+        if len(batch) >= batch_size:
+            yield batch, n
+            batch, n = {}, 0
+    if batch:
+        yield batch, n
+
+
+def existing_query(batch: Dict[Any, Dict[str, Any]], key_field: str, run_id: str, diff_field: str):
+    """(filter, projection) that fetches the stored diff_field of every key in the batch."""
+    return {"run_id": run_id, key_field: {"$in": list(batch)}}, {"_id": 0, key_field: 1, diff_field: 1}
+
+
+def drop_unchanged(batch: Dict[Any, Dict[str, Any]], existing: Iterable[Dict[str, Any]], key_field: str, diff_field: str) -> int:
+    """Remove batch entries whose diff_field equals the stored one; returns how many were dropped."""
+    dropped = 0
+    for row in existing:
+        key_val = row.get(key_field)
+        doc = batch.get(key_val)
+        if doc is not None and doc.get(diff_field) is not None and doc.get(diff_field) == row.get(diff_field):
+            del batch[key_val]
+            dropped += 1
+    return dropped
+
+
+def record_bulk_result(collection_name: str, res: UpsertBatchResult, out: Any = None, exc: Optional[BulkWriteError] = None) -> None:
+    if exc is None:
+        res.matched = out.matched_count
+        res.modified = out.modified_count
+        res.upserted = out.upserted_count
+    else:
+        details = exc.details or {}
+        res.matched = details.get("nMatched", 0)
+        res.modified = details.get("nModified", 0)
+        res.upserted = details.get("nUpserted", 0)
+        res.errors = [
+            {"index": e.get("index"), "code": e.get("code"), "errmsg": str(e.get("errmsg", ""))[:300]}
+            for e in details.get("writeErrors", [])
+        ]
+    logger.info(
+        "upsert %s batch=%d size=%d matched=%d modified=%d upserted=%d errors=%d %.2fs",
+        collection_name,
+        res.batch_index,
+        res.size,
+        res.matched,
+        res.modified,
+        res.upserted,
+        len(res.errors),
+        res.seconds,
+    )
+
+
+def raise_on_upsert_errors(report: UpsertReport) -> None:
+    if report.error_count:
+        failed = sum(1 for b in report.batches if b.errors)
+        raise RuntimeError(
+            f"Bulk upsert into {report.collection} had {report.error_count} write errors in {failed} of {len(report.batches)} batches"
+        )
+
+
+def _write_upsert_batch(
+    collection: Collection,
+    batch: Dict[Any, Dict[str, Any]],
+    key_field: str,
+    run_id: str,
+    batch_index: int,
+    diff_field: Optional[str] = None,
+) -> UpsertBatchResult:
+    t0 = time.perf_counter()
+    skipped = 0
+    if diff_field:
+        flt, proj = existing_query(batch, key_field, run_id, diff_field)
+        skipped = drop_unchanged(batch, collection.find(flt, proj), key_field, diff_field)
+    ops = upsert_ops(batch, key_field, run_id, collection)
+    res = UpsertBatchResult(batch_index=batch_index, size=len(ops), skipped=skipped)
+    if not ops:
+        res.seconds = time.perf_counter() - t0
+        logger.info("upsert %s batch=%d skipped=%d unchanged, nothing to write", collection.name, batch_index, skipped)
+        return res
+    try:
+        out = collection.bulk_write(ops, ordered=False)
+        res.seconds = time.perf_counter() - t0
+        record_bulk_result(collection.name, res, out)
+    except BulkWriteError as exc:
+        res.seconds = time.perf_counter() - t0
+        record_bulk_result(collection.name, res, exc=exc)
+    return res
+
+
 def safe_upsert_many(
     collection: Collection,
     docs: Iterable[Dict[str, Any]],
     key_field: str,
     run_id: str,
     dry_run: bool = False,
+    batch_size: int = 0,
+    report: Optional[UpsertReport] = None,
+    diff_field: Optional[str] = None,
 ) -> int:
+    """Upsert docs keyed by (key_field, run_id).
+
+    With diff_field, each batch first reads the stored diff_field values for its keys and
+    skips docs whose value is unchanged; the skips are counted in the report.
+    """
     assert_safe_write_target(collection)
     n = 0
     if dry_run:
         return sum(1 for _ in docs)
-    for doc in docs:
-        key_val = doc.get(key_field)
-        if key_val is None:
-            continue
-        filter_query = {key_field: key_val, "run_id": run_id}
-        collection.update_one(filter_query, {"$set": doc}, upsert=True)
-        n += 1
+    if diff_field and batch_size <= 1:
+        batch_size = 1000
+    if batch_size <= 1:
+        for doc in docs:
+            key_val = doc.get(key_field)
+            if key_val is None:
+                continue
+            filter_query = {key_field: key_val, "run_id": run_id}
+            collection.update_one(filter_query, {"$set": doc}, upsert=True)
+            n += 1
+        return n
+
+    report = report if report is not None else UpsertReport(collection.name)
+    for batch, batch_n in iter_upsert_batches(docs, key_field, batch_size):
+        report.batches.append(_write_upsert_batch(collection, batch, key_field, run_id, len(report.batches), diff_field))
+        n += batch_n
+    raise_on_upsert_errors(report)
     return n
 
 
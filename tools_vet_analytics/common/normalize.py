@@ -1,27 +1,118 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+import re as _std_re
+
 import regex as re
 
+_SEP = "\x00"
+_PUNCT_PAIRS = tuple((c + c, c) for c in "!?.,;:")
+# `regex` \s (Unicode White_Space) and str.split() (isspace) disagree only on U+001C..U+001F.
+# Without those characters split/join is the same collapse-and-strip, much faster than a regex pass.
+_SPACE_RUN = re.compile(r"\s+")
+_INFO_SEPARATORS = _std_re.compile("[\x1c-\x1f]")
 
-def normalize_ru_text(text: str) -> str:
-    t = (text or "").lower().replace("ё", "е")
-    t = re.sub(r"[\t\r\f\v]+", " ", t)
-    t = re.sub(r"([!?.,;:])\1{1,}", r"\1", t)
-    t = re.sub(r"\s+", " ", t).strip()
-    t = re.sub(r"^страница\s+\d+\s*$", "", t, flags=re.I)
+
+def _collapse_punct(t: str) -> str:
+    # Same result as re.sub(r"([!?.,;:])\1{1,}", r"\1", t): each replace halves a run of one mark.
+    for pair, mark in _PUNCT_PAIRS:
+        while pair in t:
+            t = t.replace(pair, mark)
     return t
 
 
-def split_chunks(text: str, chunk_size: int = 1500, overlap: int = 250):
+def _collapse_spaces(t: str) -> str:
+    if _INFO_SEPARATORS.search(t) is None:
+        return " ".join(t.split())
+    return _SPACE_RUN.sub(" ", t).strip()
+
+
+@dataclass(frozen=True)
+class NormalizerRules:
+    char_map: Dict[str, str] = field(default_factory=dict)
+    page_marker: str = ""
+
+
+LOCALE_RULES: Dict[str, NormalizerRules] = {
+    "ru": NormalizerRules(char_map={"ё": "е"}, page_marker=r"^страница\s+\d+\s*$"),
+    "pt": NormalizerRules(page_marker=r"^p[aá]gina\s+\d+\s*$"),
+    "sw": NormalizerRules(page_marker=r"^ukurasa\s+\d+\s*$"),
+}
+
+
+class TextNormalizer:
+    """Lowercase, map characters, collapse repeated punctuation and whitespace, drop page-number lines.
+
+    Output matches the original normalize_ru_text regex chain byte for byte for the ru rules.
+    Case folding stays on str.lower() (context rules such as final sigma cannot be
+    expressed as a table); tab/CR/FF/VT need no mapping since whitespace collapse covers them.
+    """
+
+    def __init__(self, rules: NormalizerRules):
+        self._char_map = tuple(rules.char_map.items())
+        self._page = re.compile(rules.page_marker, flags=re.I) if rules.page_marker else None
+
+    def _fold(self, t: str) -> str:
+        t = t.lower()
+        for src, dst in self._char_map:
+            t = t.replace(src, dst)
+        return _collapse_punct(t)
+
+    def normalize(self, text: str) -> str:
+        t = _collapse_spaces(self._fold(text or ""))
+        if self._page is not None and self._page.match(t):
+            return ""
+        return t
+
+    def normalize_many(self, texts: Iterable[str]) -> List[str]:
+        # Fold the whole batch at once: texts are joined on NUL, which is neither whitespace
+        # nor punctuation and not case-ignorable, so no rule can act across two texts.
+        items = [t or "" for t in texts]
+        if not items:
+            return []
+        joined = _SEP.join(items)
+        if joined.count(_SEP) != len(items) - 1:
+            return [self.normalize(t) for t in items]
+        out = [_collapse_spaces(p) for p in self._fold(joined).split(_SEP)]
+        if self._page is not None:
+            out = ["" if self._page.match(p) else p for p in out]
+        return out
+
+
+@lru_cache(maxsize=None)
+def get_normalizer(locale: str = "ru") -> TextNormalizer:
+    key = (locale or "ru").lower().split("-")[0]
+    return TextNormalizer(LOCALE_RULES.get(key, LOCALE_RULES["ru"]))
+
+
+def normalize_ru_text(text: str) -> str:
+    return _RU.normalize(text)
+
+
+def normalize_many(texts: Iterable[str], locale: str = "ru") -> List[str]:
+    return get_normalizer(locale).normalize_many(texts)
+
+
+_RU = get_normalizer("ru")
+
+
+def split_chunk_offsets(text: str, chunk_size: int = 1500, overlap: int = 250):
     if not text:
         return []
-    chunks = []
+    spans = []
     start = 0
     n = len(text)
     while start < n:
         end = min(n, start + chunk_size)
-        chunks.append(text[start:end])
+        spans.append((start, end))
         if end == n:
             break
         start = max(end - overlap, start + 1)
-    return chunks
+    return spans
+
+
+def split_chunks(text: str, chunk_size: int = 1500, overlap: int = 250):
+    return [text[s:e] for s, e in split_chunk_offsets(text, chunk_size, overlap)]
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from collections import Counter, defaultdict
+import math
+from collections import Counter
 from statistics import median
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 
 
 def _type_of(v: Any) -> str:
@@ -31,72 +32,322 @@ def flatten_paths(doc: Dict[str, Any], max_depth: int = 3, prefix: str = "") ->
     return out
 
 
-def infer_schema_profile(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
-    total = len(samples)
-    if total == 0:
-        return {"field_profiles": {}, "content_fields": [], "language_fields": [], "title_fields": []}
-
-    field_profiles: Dict[str, Dict[str, Any]] = {}
-    lengths: Dict[str, List[int]] = defaultdict(list)
-
-    flat_samples = [flatten_paths(s, max_depth=3) for s in samples]
-    all_paths = sorted({p for fs in flat_samples for p in fs.keys()})
-
-    for p in all_paths:
-        type_counter = Counter()
-        missing = null = empty_string = empty_array = 0
-        for fs in flat_samples:
-            if p not in fs:
-                missing += 1
-                type_counter["missing"] += 1
-                continue
-            val = fs[p]
-            t = _type_of(val)
-            type_counter[t] += 1
-            if val is None:
-                null += 1
-            if isinstance(val, str):
-                if val.strip() == "":
-                    empty_string += 1
-                else:
-                    lengths[p].append(len(val))
-            if isinstance(val, list) and len(val) == 0:
-                empty_array += 1
-        lens = sorted(lengths.get(p, []))
-        p50 = median(lens) if lens else 0
-        p95 = lens[int(max(0, min(len(lens) - 1, round(0.95 * (len(lens) - 1)))))] if lens else 0
-        field_profiles[p] = {
-            "type_distribution": dict(type_counter),
-            "missing_pct": missing / total,
-            "null_pct": null / total,
-            "empty_string_pct": empty_string / total,
-            "empty_array_pct": empty_array / total,
-            "avg_length": (sum(lens) / len(lens)) if lens else 0,
-            "p50_length": p50,
-            "p95_length": p95,
-            "coverage_pct": 1 - (missing / total),
+LANGUAGE_CANDIDATES = {"language", "lang", "locale", "output_locale", "source_locale"}
+TITLE_CANDIDATES = {"title", "name", "filename", "doc_title"}
+CONTENT_CANDIDATES = {"content", "text", "body", "answer", "message"}
+
+
+class LengthSketch:
+    """Mergeable quantile sketch for string lengths.
+
+    Values are kept exactly up to ``exact_limit`` (so small samples reproduce the
+    exact median/p95), then folded into log-spaced buckets with relative error
+    ``alpha``, DDSketch-style. Two sketches merge by adding bucket counts.
+    """
+
+    def __init__(self, alpha: float = 0.01, exact_limit: int = 2048):
+        self.alpha = alpha
+        self.exact_limit = exact_limit
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.total = 0
+        self.values: List[int] | None = []
+        self.buckets: Counter = Counter()
+        self.zeros = 0
+
+    def _bucket_add(self, x: float, n: int = 1) -> None:
+        if x <= 0:
+            self.zeros += n
+        else:
+            self.buckets[math.ceil(math.log(x) / self._log_gamma)] += n
+
+    def _collapse(self) -> None:
+        for v in self.values or []:
+            self._bucket_add(v)
+        self.values = None
+
+    def add(self, x: int) -> None:
+        self.count += 1
+        self.total += x
+        if self.values is not None:
+            self.values.append(x)
+            if len(self.values) > self.exact_limit:
+                self._collapse()
+        else:
+            self._bucket_add(x)
+
+    def merge(self, other: "LengthSketch") -> "LengthSketch":
+        self.count += other.count
+        self.total += other.total
+        if self.values is not None and other.values is not None and len(self.values) + len(other.values) <= self.exact_limit:
+            self.values.extend(other.values)
+            return self
+        if self.values is not None:
+            self._collapse()
+        if other.values is not None:
+            for v in other.values:
+                self._bucket_add(v)
+        else:
+            self.buckets.update(other.buckets)
+            self.zeros += other.zeros
+        return self
+
+    def mean(self) -> float:
+        return (self.total / self.count) if self.count else 0
+
+    def _value_at_rank(self, rank: int) -> float:
+        if rank < self.zeros:
+            return 0
+        seen = self.zeros
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if rank < seen:
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1) if self.buckets else 0
+
+    def median(self) -> float:
+        if not self.count:
+            return 0
+        if self.values is not None:
+            return median(self.values)
+        return self._value_at_rank((self.count - 1) // 2)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0
+        rank = int(max(0, min(self.count - 1, round(q * (self.count - 1)))))
+        if self.values is not None:
+            return sorted(self.values)[rank]
+        return self._value_at_rank(rank)
+
+
+class PathAccumulator:
+    __slots__ = ("types", "null", "empty_string", "empty_array", "lengths")
+
+    def __init__(self):
+        self.types: Counter = Counter()
+        self.null = 0
+        self.empty_string = 0
+        self.empty_array = 0
+        self.lengths = LengthSketch()
+
+    def add(self, val: Any) -> None:
+        self.types[_type_of(val)] += 1
+        if val is None:
+            self.null += 1
+        elif isinstance(val, str):
+            if val.strip() == "":
+                self.empty_string += 1
+            else:
+                self.lengths.add(len(val))
+        elif isinstance(val, list) and len(val) == 0:
+            self.empty_array += 1
+
+    def merge(self, other: "PathAccumulator") -> "PathAccumulator":
+        self.types.update(other.types)
+        self.null += other.null
+        self.empty_string += other.empty_string
+        self.empty_array += other.empty_array
+        self.lengths.merge(other.lengths)
+        return self
+
+
+class SchemaProfiler:
+    """Single-pass schema profiler; feed documents with add() and combine partial profilers with merge()."""
+
+    def __init__(self, max_depth: int = 3, track_titles: bool = True):
+        self.max_depth = max_depth
+        self.track_titles = track_titles
+        self.total = 0
+        self.paths: Dict[str, PathAccumulator] = {}
+        self.title_values: Dict[str, Counter] = {}
+
+    def _walk(self, doc: Dict[str, Any], depth: int, prefix: str) -> None:
+        for k, v in doc.items():
+            path = f"{prefix}.{k}" if prefix else k
+            acc = self.paths.get(path)
+            if acc is None:
+                acc = self.paths[path] = PathAccumulator()
+            acc.add(v)
+            if self.track_titles and isinstance(v, str) and str(k).lower() in TITLE_CANDIDATES:
+                self.title_values.setdefault(path, Counter())[v] += 1
+            if depth > 1 and isinstance(v, dict):
+                self._walk(v, depth - 1, path)
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        self.total += 1
+        self._walk(doc, self.max_depth, "")
+
+    def add_many(self, docs: Iterable[Dict[str, Any]]) -> "SchemaProfiler":
+        for doc in docs:
+            self.add(doc)
+        return self
+
+    def merge(self, other: "SchemaProfiler") -> "SchemaProfiler":
+        self.total += other.total
+        for p, acc in other.paths.items():
+            if p in self.paths:
+                self.paths[p].merge(acc)
+            else:
+                self.paths[p] = acc
+        for p, cnt in other.title_values.items():
+            self.title_values.setdefault(p, Counter()).update(cnt)
+        return self
+
+    def add_aggregate_rows(self, rows: Iterable[Dict[str, Any]]) -> "SchemaProfiler":
+        """Fold in per-(path, type) rows produced by schema_stats_pipeline."""
+        for row in rows:
+            p = row["_id"]["p"]
+            t = AGG_TYPE_MAP.get(row["_id"]["t"], "other")
+            acc = self.paths.get(p)
+            if acc is None:
+                acc = self.paths[p] = PathAccumulator()
+            acc.types[t] += row["n"]
+            if t == "null":
+                acc.null += row["n"]
+            acc.empty_string += row.get("blank", 0)
+            acc.empty_array += row.get("empty_array", 0)
+            for x in row.get("lens", []):
+                if isinstance(x, int):
+                    acc.lengths.add(x)
+            if p == "_id":
+                self.total += row["n"]
+        return self
+
+    def top_titles(self, path: str, n: int = 5) -> List[Tuple[str, int]]:
+        return self.title_values.get(path, Counter()).most_common(n)
+
+    def result(self) -> Dict[str, Any]:
+        total = self.total
+        if total == 0:
+            return {"field_profiles": {}, "content_fields": [], "language_fields": [], "title_fields": []}
+
+        field_profiles: Dict[str, Dict[str, Any]] = {}
+        all_paths = sorted(self.paths)
+
+        for p in all_paths:
+            acc = self.paths[p]
+            type_counter = Counter(acc.types)
+            missing = total - sum(type_counter.values())
+            if missing:
+                type_counter["missing"] += missing
+            lens = acc.lengths
+            field_profiles[p] = {
+                "type_distribution": dict(type_counter),
+                "missing_pct": missing / total,
+                "null_pct": acc.null / total,
+                "empty_string_pct": acc.empty_string / total,
+                "empty_array_pct": acc.empty_array / total,
+                "avg_length": lens.mean(),
+                "p50_length": lens.median(),
+                "p95_length": lens.percentile(0.95),
+                "coverage_pct": 1 - (missing / total),
+            }
+
+        language_fields = [p for p in all_paths if p.split(".")[-1].lower() in LANGUAGE_CANDIDATES]
+        title_fields = [p for p in all_paths if p.split(".")[-1].lower() in TITLE_CANDIDATES]
+
+        content_fields: List[Tuple[str, float]] = []
+        for p in all_paths:
+            leaf = p.split(".")[-1].lower()
+            prof = field_profiles[p]
+            if prof["type_distribution"].get("string", 0) > 0 and (
+                leaf in CONTENT_CANDIDATES or prof["avg_length"] > 250
+            ):
+                content_fields.append((p, prof["avg_length"]))
+        content_fields.sort(key=lambda x: x[1], reverse=True)
+
+        return {
+            "field_profiles": field_profiles,
+            "content_fields": [p for p, _ in content_fields],
+            "language_fields": language_fields,
+            "title_fields": title_fields,
         }
 
-    language_candidates = {"language", "lang", "locale", "output_locale", "source_locale"}
-    title_candidates = {"title", "name", "filename", "doc_title"}
-    content_candidates = {"content", "text", "body", "answer", "message"}
 
-    language_fields = [p for p in all_paths if p.split(".")[-1].lower() in language_candidates]
-    title_fields = [p for p in all_paths if p.split(".")[-1].lower() in title_candidates]
+def infer_schema_profile(samples: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    return SchemaProfiler(track_titles=False).add_many(samples).result()
+
 
-    content_fields: List[Tuple[str, float]] = []
-    for p in all_paths:
-        leaf = p.split(".")[-1].lower()
-        prof = field_profiles[p]
-        if prof["type_distribution"].get("string", 0) > 0 and (
-            leaf in content_candidates or prof["avg_length"] > 250
-        ):
-            content_fields.append((p, prof["avg_length"]))
-    content_fields.sort(key=lambda x: x[1], reverse=True)
+# BSON $type names mapped onto the buckets used by _type_of.
+AGG_TYPE_MAP = {
+    "null": "null",
+    "bool": "bool",
+    "int": "number",
+    "long": "number",
+    "double": "number",
+    "decimal": "number",
+    "string": "string",
+    "array": "array",
+    "object": "object",
+}
 
+
+def _expand_entry(entry: str, depth: int) -> Dict[str, Any]:
+    # Emits the entry itself plus, if it is an object at `depth`, its children one level down.
     return {
-        "field_profiles": field_profiles,
-        "content_fields": [p for p, _ in content_fields],
-        "language_fields": language_fields,
-        "title_fields": title_fields,
+        "$concatArrays": [
+            [f"${entry}"],
+            {
+                "$cond": [
+                    {"$and": [{"$eq": [{"$type": f"${entry}.v"}, "object"]}, {"$eq": [f"${entry}.d", depth]}]},
+                    {
+                        "$map": {
+                            "input": {"$objectToArray": f"${entry}.v"},
+                            "as": "x",
+                            "in": {"k": {"$concat": [f"${entry}.k", ".", "$$x.k"]}, "v": "$$x.v", "d": depth + 1},
+                        }
+                    },
+                    [],
+                ]
+            },
+        ]
     }
+
+
+def schema_stats_pipeline(sample_n: int, max_depth: int = 3) -> List[Dict[str, Any]]:
+    """Aggregation that samples documents server-side and returns per-(path, type) statistics.
+
+    Paths are flattened like flatten_paths (objects expanded up to max_depth levels);
+    only counters and string lengths leave the server, never the sampled documents.
+    """
+    pipeline: List[Dict[str, Any]] = [
+        {"$sample": {"size": sample_n}},
+        {
+            "$project": {
+                "_id": 0,
+                "e": {"$map": {"input": {"$objectToArray": "$$ROOT"}, "as": "x", "in": {"k": "$$x.k", "v": "$$x.v", "d": 1}}},
+            }
+        },
+        {"$unwind": "$e"},
+    ]
+    for depth in range(1, max_depth):
+        pipeline += [{"$project": {"e": _expand_entry("e", depth)}}, {"$unwind": "$e"}]
+    pipeline += [
+        {"$project": {"p": "$e.k", "v": "$e.v", "t": {"$type": "$e.v"}}},
+        {
+            "$project": {
+                "p": 1,
+                "t": 1,
+                "blank": {"$cond": [{"$eq": ["$t", "string"]}, {"$eq": [{"$trim": {"input": "$v"}}, ""]}, False]},
+                "empty_array": {"$cond": [{"$eq": ["$t", "array"]}, {"$eq": [{"$size": "$v"}, 0]}, False]},
+                "len": {"$cond": [{"$eq": ["$t", "string"]}, {"$strLenCP": "$v"}, "$$REMOVE"]},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"p": "$p", "t": "$t"},
+                "n": {"$sum": 1},
+                "blank": {"$sum": {"$cond": ["$blank", 1, 0]}},
+                "empty_array": {"$sum": {"$cond": ["$empty_array", 1, 0]}},
+                "lens": {"$push": {"$cond": ["$blank", "$$REMOVE", "$len"]}},
+            }
+        },
+    ]
+    return pipeline
+
+
+def profile_from_aggregate(rows: Iterable[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+    prof = SchemaProfiler(track_titles=False).add_aggregate_rows(rows)
+    return prof.total, prof.result()
@@ -0,0 +1,89 @@
+"""Single cursor per selected source collection, fanned out to several batch consumers.
+
+A consumer is ``fn(docs, collection, content_field)`` and sees each cursor batch once. Steps 02 and 03 use this so a fused
+run reads each source collection once instead of once per step.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .aio import connect_mongo_async, run_pipeline
+
+Consumer = Callable[[List[Dict[str, Any]], str, str], Any]
+Source = Tuple[str, int, str]
+
+
+def source_projection(content_field: str, fields: Iterable[str]) -> Dict[str, int]:
+    return {content_field: 1, **{f: 1 for f in fields}}
+
+
+def scan_sources(
+    rdb,
+    selected: Sequence[Source],
+    consumers: List[Consumer],
+    fields: Iterable[str],
+    limit: int = 0,
+    filters: Optional[Dict[str, Dict[str, Any]]] = None,
+    batch_size: int = 500,
+) -> int:
+    fields = tuple(fields)
+    filters = filters or {}
+    n = 0
+    for coll, _, content_field in selected:
+        cur = rdb[coll].find(filters.get(coll, {}), source_projection(content_field, fields))
+        if limit:
+            cur = cur.limit(limit)
+        batch: List[Dict[str, Any]] = []
+        for doc in cur:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                for fn in consumers:
+                    fn(batch, coll, content_field)
+                n += len(batch)
+                batch = []
+        if batch:
+            for fn in consumers:
+                fn(batch, coll, content_field)
+            n += len(batch)
+    return n
+
+
+async def scan_sources_async(
+    cfg,
+    selected: Sequence[Source],
+    consumers: List[Consumer],
+    fields: Iterable[str],
+    sink=None,
+    filters: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> None:
+    """Async counterpart of scan_sources; if the last consumer returns lists they are batched into ``sink``."""
+    fields = tuple(fields)
+    filters = filters or {}
+    amongo = await connect_mongo_async(cfg)
+    try:
+        cursors = []
+        for coll, _, content_field in selected:
+            cur = amongo.read_db[coll].find(filters.get(coll, {}), source_projection(content_field, fields))
+            if cfg.limit:
+                cur = cur.limit(cfg.limit)
+            cursors.append(cur)
+
+        def transform(batch, i):
+            coll, _, content_field = selected[i]
+            res = None
+            for fn in consumers:
+                res = fn(batch, coll, content_field)
+            return res if sink is not None and res else None
+
+        async def write(items):
+            await sink(amongo, items)
+
+        await run_pipeline(
+            cursors,
+            transform,
+            write if sink is not None else None,
+            batch_size=cfg.async_batch_size,
+            queue_size=cfg.async_queue_size,
+        )
+    finally:
+        await amongo.close()
@@ -4,6 +4,8 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, List, Optional, Tuple
 
+import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 STOPWORDS_DIR = Path(__file__).with_name("stopwords")
@@ -47,13 +49,12 @@ def stopword_hit_count(text: str, locale: str) -> int:
     return sum(1 for t in tokens if t in words)
 
 
-def build_tfidf(
-    texts: List[str],
+def make_vectorizer(
     max_features: int = 30000,
     use_stopwords: bool = True,
     locales: Optional[Iterable[str]] = None,
-):
-    vec = TfidfVectorizer(
+) -> TfidfVectorizer:
+    return TfidfVectorizer(
         analyzer="word",
         ngram_range=(1, 2),
         min_df=1,
@@ -61,10 +62,27 @@ def build_tfidf(
         token_pattern=r"(?u)\b[^\W\d_]{2,}\b",
         stop_words=get_stopwords_for_locales(locales) if use_stopwords else None,
     )
+
+
+def build_tfidf(
+    texts: List[str],
+    max_features: int = 30000,
+    use_stopwords: bool = True,
+    locales: Optional[Iterable[str]] = None,
+):
+    vec = make_vectorizer(max_features, use_stopwords, locales)
     mat = vec.fit_transform(texts)
     return vec, mat
 
 
+def restore_vectorizer(terms: List[str], idf: np.ndarray, **params) -> TfidfVectorizer:
+    """A fitted vectorizer from a saved vocabulary (terms in column order) and idf vector."""
+    vec = make_vectorizer(**params)
+    vec.vocabulary_ = {t: i for i, t in enumerate(terms)}
+    vec.idf_ = np.asarray(idf, dtype=np.float64)
+    return vec
+
+
 def top_terms_for_row(vec: TfidfVectorizer, row, top_n: int = 20) -> List[Tuple[str, float]]:
     if row.nnz == 0:
         return []
@@ -72,3 +90,59 @@ def top_terms_for_row(vec: TfidfVectorizer, row, top_n: int = 20) -> List[Tuple[
     idx = arr.argsort()[::-1][:top_n]
     feats = vec.get_feature_names_out()
     return [(feats[i], float(arr[i])) for i in idx if arr[i] > 0]
+
+
+def cluster_members(labels, k: int) -> List[np.ndarray]:
+    """Row indices per cluster, ascending."""
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(k + 1))
+    return [order[bounds[c]:bounds[c + 1]] for c in range(k)]
+
+
+def cluster_term_means(mat, labels, k: int):
+    """(k x features) sparse matrix of mean term weights per cluster, one sparse product for all clusters."""
+    labels = np.asarray(labels)
+    n = mat.shape[0]
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    weights = 1.0 / np.maximum(counts, 1.0)
+    indicator = sparse.csr_matrix((weights[labels], (labels, np.arange(n))), shape=(k, n))
+    return sparse.csr_matrix(indicator @ mat)
+
+
+def cluster_top_terms(mat, labels, k: int, top_n: int = 50) -> List[np.ndarray]:
+    """Feature indices of the top_n positive mean weights per cluster, weight desc then index asc."""
+    means = cluster_term_means(mat, labels, k)
+    out = []
+    for c in range(k):
+        lo, hi = means.indptr[c], means.indptr[c + 1]
+        idx, val = means.indices[lo:hi], means.data[lo:hi]
+        keep = val > 0
+        idx, val = idx[keep], val[keep]
+        if len(val) > top_n:
+            part = np.argpartition(-val, top_n - 1)[:top_n]
+            idx, val = idx[part], val[part]
+        order = np.lexsort((idx, -val))
+        out.append(idx[order])
+    return out
+
+
+def nearest_to_centroid(X, labels, centers, top_n: int = 5) -> List[np.ndarray]:
+    """Row indices of the top_n rows closest (Euclidean) to their own cluster center, per cluster."""
+    labels = np.asarray(labels)
+    centers = np.asarray(centers, dtype=np.float64)
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X)
+        row_sq = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+        # Row-wise dot with the row's own center: gather center values at the row's nonzeros.
+        row_of = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        dots = np.bincount(row_of, weights=X.data * centers[labels[row_of], X.indices], minlength=X.shape[0])
+    else:
+        X = np.asarray(X, dtype=np.float64)
+        row_sq = np.einsum("ij,ij->i", X, X)
+        dots = np.einsum("ij,ij->i", X, centers[labels])
+    c_sq = np.einsum("ij,ij->i", centers, centers)
+    dist = np.sqrt(np.maximum(row_sq - 2.0 * dots + c_sq[labels], 0.0))
+    order = np.lexsort((np.arange(len(labels)), dist, labels))
+    bounds = np.searchsorted(labels[order], np.arange(len(centers) + 1))
+    return [order[bounds[c]:min(bounds[c] + top_n, bounds[c + 1])] for c in range(len(centers))]
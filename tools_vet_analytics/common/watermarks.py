@@ -0,0 +1,127 @@
+"""Per-source high-water marks for incremental runs of steps 02-03.
+
+A watermark records, per (collection, content_field, watermark field), the highest
+value ingested by a run plus a hash of the settings that shape evidence blocks.
+The next incremental run reads only documents above that mark and carries the
+previous run's outputs forward for everything else.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .hashing import sha1_text
+from .mongo import safe_upsert_many
+
+WATERMARK_COLLECTION = "ingest_watermarks"
+
+
+def settings_hash(cfg, content_field: str) -> str:
+    locales = ",".join(sorted(cfg.include_locales or []))
+    return sha1_text(f"{content_field}|{cfg.chunk_size_chars}|{cfg.overlap_chars}|{locales}")
+
+
+class IncrementalPlan:
+    def __init__(self, collection: str, content_field: str, field: str, prev: Optional[Dict[str, Any]], high: Any, settings: str):
+        self.collection = collection
+        self.content_field = content_field
+        self.field = field
+        self.prev = prev
+        self.high = high
+        self.settings = settings
+        self.changed_ids: Set[str] = set()
+
+    @property
+    def prev_run_id(self) -> Optional[str]:
+        return self.prev["run_id"] if self.prev else None
+
+    @property
+    def filter(self) -> Dict[str, Any]:
+        # Without a previous mark this is a full read, including docs that lack the field.
+        if self.high is None or self.prev is None:
+            return {}
+        delta = {self.field: {"$gt": self.prev["value"], "$lte": self.high}}
+        if self.field == "_id":
+            return delta
+        # Docs without the field can't be placed relative to the mark, so every run re-reads them.
+        return {"$or": [delta, {self.field: {"$exists": False}}]}
+
+    def track(self, docs, coll: str, content_field: str) -> None:
+        self.changed_ids.update(str(d.get("_id")) for d in docs)
+
+
+def _previous_watermark(wdb, cfg, coll: str, content_field: str) -> Optional[Dict[str, Any]]:
+    return wdb[WATERMARK_COLLECTION].find_one(
+        {"collection": coll, "content_field": content_field, "field": cfg.watermark_field, "run_id": {"$ne": cfg.run_id}},
+        sort=[("created_at", -1)],
+    )
+
+
+def plan_incremental(ctx, selected: Sequence[Tuple[str, int, str]]) -> Dict[str, IncrementalPlan]:
+    """Build (once per run) the delta filter for each selected source; cached in ctx."""
+    plans = ctx.get("incremental_plans")
+    if plans is not None:
+        return plans
+    cfg = ctx["config"]
+    rdb = ctx["mongo"].read_db
+    wdb = ctx["mongo"].write_db
+    logger = ctx["logger"]
+    plans = {}
+    for coll, _, content_field in selected:
+        # The upper bound is fixed up front so docs written during the scan are left for the next run.
+        top = rdb[coll].find_one({cfg.watermark_field: {"$exists": True}}, {cfg.watermark_field: 1}, sort=[(cfg.watermark_field, -1)])
+        high = top.get(cfg.watermark_field) if top else None
+        settings = settings_hash(cfg, content_field)
+        prev = _previous_watermark(wdb, cfg, coll, content_field)
+        if high is None:
+            prev = None
+        elif prev is not None and prev.get("settings_hash") != settings:
+            logger.info("Watermark for %s ignored: chunking/locale settings changed; full rebuild", coll)
+            prev = None
+        plans[coll] = IncrementalPlan(coll, content_field, cfg.watermark_field, prev, high, settings)
+        logger.info(
+            "Incremental %s: %s > %s (up to %s), carry forward from run %s",
+            coll,
+            cfg.watermark_field,
+            prev["value"] if prev else "-",
+            high,
+            prev["run_id"] if prev else "-",
+        )
+    ctx["incremental_plans"] = plans
+    return plans
+
+
+def carried_blocks(wdb, plan: IncrementalPlan, run_id: str) -> Iterator[Dict[str, Any]]:
+    """Previous run's evidence blocks of this source whose documents were not re-read."""
+    if plan.prev_run_id is None:
+        return
+    for b in wdb["evidence_blocks"].find({"run_id": plan.prev_run_id, "source_collection": plan.collection}):
+        if b.get("source_doc_id") in plan.changed_ids:
+            continue
+        b.pop("_id", None)
+        b["run_id"] = run_id
+        yield b
+
+
+def record_watermarks(wdb, cfg, plans: Dict[str, IncrementalPlan], stats: Dict[str, Dict[str, int]]) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc).isoformat()
+    docs = []
+    for coll, plan in plans.items():
+        if plan.high is None:
+            continue
+        docs.append({
+            "watermark_id": f"wm::{coll}::{plan.content_field}::{plan.field}",
+            "run_id": cfg.run_id,
+            "collection": coll,
+            "content_field": plan.content_field,
+            "field": plan.field,
+            "value": plan.high,
+            "previous_value": plan.prev["value"] if plan.prev else None,
+            "previous_run_id": plan.prev_run_id,
+            "settings_hash": plan.settings,
+            "changed_docs": len(plan.changed_ids),
+            **stats.get(coll, {}),
+            "created_at": now,
+        })
+    safe_upsert_many(wdb[WATERMARK_COLLECTION], docs, "watermark_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)
+    return docs
@@ -12,10 +12,38 @@ class AnalyticsConfig:
     mongo_db_read: str = "vet_database"
     mongo_db_write: str = "vet_analytics"
     sample_per_collection: int = 200
+    inventory_workers: int = 4
+    inventory_sampling: str = "natural"
+    inventory_refresh: bool = False
     limit: int = 0
+    dedup_mode: str = "exact"
+    near_dup_threshold: float = 0.8
+    minhash_num_perm: int = 64
+    minhash_shingle_size: int = 5
+    fused_scan: bool = False
+    incremental: bool = False
+    watermark_field: str = "_id"
     chunk_size_chars: int = 1500
+    block_text_mode: str = "inline"
+    block_flush_size: int = 0
+    langid_cache_path: str = ".cache/vet_analytics/langid.sqlite"
     overlap_chars: int = 250
     k_clusters: int = 50
+    cluster_engine: str = "kmeans"
+    cluster_sample_size: int = 0
+    minibatch_size: int = 1024
+    k_candidates: List[int] | None = None
+    auto_k_sample_size: int = 5000
+    auto_k_workers: int = 0
+    svd_components: int = 0
+    artifacts_dir: str = ".artifacts/vet_analytics"
+    persist_tfidf: bool = False
+    assign_from_run_id: str = ""
+    assign_drift_threshold: float = 0.25
+    warm_start_run_id: str = ""
+    vectorizer: str = "tfidf"
+    hash_features: int = 2 ** 20
+    vectorize_batch_size: int = 5000
     dry_run: bool = False
     resume: bool = False
     run_id: str = ""
@@ -25,6 +53,19 @@ class AnalyticsConfig:
     include_locales: List[str] | None = None
     allow_overwrite_run: bool = False
     recompute_titles_only: bool = False
+    write_batch_size: int = 1000
+    skip_unchanged_writes: bool = False
+    io_mode: str = "sync"
+    async_batch_size: int = 500
+    async_queue_size: int = 4
+    source_backend: str = "mongo"
+    storage_backend: str = "mongo"
+    local_store_dir: str = ".local_store"
+    mongo_max_pool_size: int = 100
+    mongo_timeout_ms: int = 10000
+    mongo_socket_timeout_ms: int = 0
+    srv_cache_path: str = ".cache/vet_analytics/srv_cache.json"
+    srv_cache_ttl_s: int = 86400
 
     def to_dict(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -33,7 +74,7 @@ class AnalyticsConfig:
         return data
 
 
-def load_env_config() -> AnalyticsConfig:
+def load_env_config(require_mongo: bool = True) -> AnalyticsConfig:
     shared_uri = (
         os.environ.get("MONGODB_URI")
         or os.environ.get("MONGO_URI")
@@ -42,7 +83,7 @@ def load_env_config() -> AnalyticsConfig:
     )
     read_uri = os.environ.get("MONGO_URI_READ") or shared_uri
     write_uri = os.environ.get("MONGO_URI_WRITE") or shared_uri
-    if not read_uri or not write_uri:
+    if require_mongo and (not read_uri or not write_uri):
         raise RuntimeError(
             "Set MONGO_URI_READ/MONGO_URI_WRITE or MONGODB_URI (or MONGO_URI). "
             "For GitHub Actions set MONGODB_URI or MONGO_URI_READ/MONGO_URI_WRITE secrets."
@@ -53,4 +94,9 @@ def load_env_config() -> AnalyticsConfig:
         mongo_uri_write=write_uri,
         mongo_db_read=os.environ.get("MONGO_DB_READ", "vet_database"),
         mongo_db_write=os.environ.get("MONGO_DB_WRITE", "vet_analytics"),
+        mongo_max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+        mongo_timeout_ms=int(os.environ.get("MONGO_TIMEOUT_MS", "10000")),
+        mongo_socket_timeout_ms=int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "0")),
+        srv_cache_path=os.environ.get("MONGO_SRV_CACHE_PATH", ".cache/vet_analytics/srv_cache.json"),
+        srv_cache_ttl_s=int(os.environ.get("MONGO_SRV_CACHE_TTL", "86400")),
     )
@@ -5,7 +5,8 @@ import json
 from collections import Counter
 from pathlib import Path
 
-from .common.mongo import connect_mongo
+from .common.indexes import ensure_indexes
+from .common.mongo import connect_from_config
 from .common.tfidf import get_stopwords_for_locales
 from .config import load_env_config
 
@@ -16,6 +17,8 @@ def parse_args():
     p = argparse.ArgumentParser(description="Export static dashboard data JSON")
     p.add_argument("--out", type=str, default="reports/dashboard_data.json")
     p.add_argument("--limit-runs", type=int, default=10)
+    p.add_argument("--storage-backend", choices=["mongo", "local"], default="mongo")
+    p.add_argument("--local-store-dir", type=str, default=".local_store")
     return p.parse_args()
 
 
@@ -28,9 +31,13 @@ def _bad_title(title: str, stopwords: set[str]) -> bool:
 
 def main():
     args = parse_args()
-    cfg = load_env_config()
-    mongo = connect_mongo(cfg.mongo_uri_read, cfg.mongo_uri_write, cfg.mongo_db_read, cfg.mongo_db_write)
+    cfg = load_env_config(require_mongo=args.storage_backend == "mongo")
+    cfg.storage_backend = args.storage_backend
+    cfg.source_backend = args.storage_backend
+    cfg.local_store_dir = args.local_store_dir
+    mongo = connect_from_config(cfg)
     wdb = mongo.write_db
+    ensure_indexes(wdb)
 
     reports = list(wdb["run_reports"].find({}, {"_id": 0}).sort("_id", -1).limit(args.limit_runs))
     stopwords = set(get_stopwords_for_locales(["ru", "pt", "sw"]))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from bson import json_util
+
+from .common.local_store import LocalClient
+from .common.mongo import connect_from_config
+from .config import load_env_config
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Load source collections into the local storage backend")
+    p.add_argument("--local-store-dir", type=str, default=".local_store")
+    p.add_argument("--db", type=str, default="", help="Target DB name (default MONGO_DB_READ or vet_database)")
+    p.add_argument("--collection", type=str, default="", help="Collection name for --files (default: file stem)")
+    p.add_argument("--files", nargs="*", default=[], help="mongoexport JSON lines or JSON array files")
+    p.add_argument("--from-mongo", action="store_true", help="Snapshot collections from MONGO_URI_READ")
+    p.add_argument("--collections", type=str, default="", help="Comma-separated collections for --from-mongo (default all)")
+    p.add_argument("--limit", type=int, default=0, help="Max docs per collection for --from-mongo")
+    p.add_argument("--batch-size", type=int, default=1000)
+    return p.parse_args()
+
+
+def _read_docs(path: Path):
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        yield from json_util.loads(text)
+        return
+    for ln in text.splitlines():
+        if ln.strip():
+            yield json_util.loads(ln)
+
+
+def _insert_batches(coll, docs, batch_size: int) -> int:
+    n = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            coll.insert_many(batch)
+            n += len(batch)
+            batch = []
+    if batch:
+        coll.insert_many(batch)
+        n += len(batch)
+    return n
+
+
+def main():
+    args = parse_args()
+    if not args.files and not args.from_mongo:
+        print("Pass --files and/or --from-mongo", file=sys.stderr)
+        sys.exit(1)
+
+    cfg = load_env_config(require_mongo=args.from_mongo)
+    db_name = args.db or cfg.mongo_db_read
+    local_db = LocalClient(args.local_store_dir)[db_name]
+
+    for fp in args.files:
+        path = Path(fp)
+        coll_name = args.collection or path.stem
+        n = _insert_batches(local_db[coll_name], _read_docs(path), args.batch_size)
+        print(f"{path} -> {db_name}.{coll_name}: {n} docs")
+
+    if args.from_mongo:
+        src = connect_from_config(cfg).read_db
+        names = [x.strip() for x in args.collections.split(",") if x.strip()] or sorted(src.list_collection_names())
+        for coll_name in names:
+            cur = src[coll_name].find({})
+            if args.limit:
+                cur = cur.limit(args.limit)
+            n = _insert_batches(local_db[coll_name], cur, args.batch_size)
+            print(f"mongo {coll_name} -> {db_name}.{coll_name}: {n} docs")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,9 @@ import importlib
 import sys
 import uuid
 
+from .common.indexes import ensure_indexes
 from .common.logging import setup_logging
-from .common.mongo import connect_mongo
+from .common.mongo import connect_from_config
 from .config import load_env_config
 
 
@@ -25,12 +26,14 @@ OUTPUT_COLLECTIONS = [
     "inv_inventory",
     "inv_samples",
     "dedup_groups",
+    "dedup_members",
     "evidence_blocks",
     "kb_concepts",
     "kb_atoms",
     "qa_units",
     "qa_eval",
     "run_reports",
+    "ingest_watermarks",
 ]
 
 
@@ -39,9 +42,126 @@ def parse_args():
     p.add_argument("--dry-run", action="store_true")
     p.add_argument("--limit", type=int, default=0)
     p.add_argument("--sample-per-collection", type=int, default=200)
+    p.add_argument("--inventory-workers", type=int, default=4, help="Threads profiling source collections in step 01")
+    p.add_argument(
+        "--inventory-sampling",
+        choices=["natural", "server"],
+        default="natural",
+        help="server: $sample + aggregated field stats and metadata counts instead of first-N docs",
+    )
+    p.add_argument(
+        "--inventory-refresh",
+        action="store_true",
+        help="Re-profile every collection even if its fingerprint matches a previous inv_inventory record",
+    )
+    p.add_argument(
+        "--dedup-mode",
+        choices=["exact", "near"],
+        default="exact",
+        help="near: also group near-identical source texts with MinHash/LSH",
+    )
+    p.add_argument("--near-dup-threshold", type=float, default=0.8, help="Estimated Jaccard similarity for near duplicates")
+    p.add_argument("--minhash-num-perm", type=int, default=64)
+    p.add_argument("--minhash-shingle-size", type=int, default=5, help="Words per shingle")
+    p.add_argument(
+        "--fused-scan",
+        action="store_true",
+        help="Read selected sources once in step 02 and build evidence blocks in the same pass (needs steps 02 and 03)",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Steps 02-03 read only docs above the last ingest watermark and carry forward the previous run's blocks",
+    )
+    p.add_argument(
+        "--watermark-field",
+        type=str,
+        default="_id",
+        help="Monotonic source field for --incremental, e.g. _id (new docs) or updated_at (new and changed docs)",
+    )
     p.add_argument("--chunk-size-chars", type=int, default=1500)
     p.add_argument("--overlap-chars", type=int, default=250)
+    p.add_argument(
+        "--block-text-mode",
+        choices=["inline", "offsets"],
+        default="inline",
+        help="offsets: store source offsets instead of chunk text; steps 04-06 slice text from the source on demand",
+    )
+    p.add_argument(
+        "--block-flush-size",
+        type=int,
+        default=0,
+        help="Stream evidence blocks to storage every N blocks instead of holding them all in memory; 0 keeps all",
+    )
+    p.add_argument(
+        "--langid-cache-path",
+        default=".cache/vet_analytics/langid.sqlite",
+        help="SQLite cache of detected source locales keyed by text hash; empty string disables it",
+    )
     p.add_argument("--k-clusters", type=int, default=50)
+    p.add_argument(
+        "--cluster-engine",
+        choices=["kmeans", "minibatch", "spherical"],
+        default="kmeans",
+        help="kmeans: full-batch KMeans(n_init=10); minibatch: MiniBatchKMeans; spherical: cosine k-means on L2-normalized rows",
+    )
+    p.add_argument(
+        "--cluster-sample-size",
+        type=int,
+        default=0,
+        help="Fit the clustering engine on this many sampled blocks, then assign every block to the nearest center; 0 fits on all",
+    )
+    p.add_argument("--minibatch-size", type=int, default=1024, help="Batch size for --cluster-engine minibatch")
+    p.add_argument(
+        "--k-candidates",
+        type=str,
+        default="",
+        help="Comma-separated k values for auto-k, e.g. 20,30,50,80; the best cosine silhouette replaces --k-clusters",
+    )
+    p.add_argument("--auto-k-sample-size", type=int, default=5000, help="Blocks sampled for the auto-k sweep")
+    p.add_argument("--auto-k-workers", type=int, default=0, help="Processes for the auto-k sweep; 0 = one per CPU")
+    p.add_argument(
+        "--svd-components",
+        type=int,
+        default=0,
+        help="Reduce TF-IDF to this many TruncatedSVD (LSA) components in float32 before clustering; 0 clusters the sparse matrix",
+    )
+    p.add_argument(
+        "--artifacts-dir",
+        default=".artifacts/vet_analytics",
+        help="Directory for per-run numpy artifacts (block embedding, SVD components)",
+    )
+    p.add_argument(
+        "--persist-tfidf",
+        action="store_true",
+        help="Save the step 04 TF-IDF model, matrix and cluster fit under --artifacts-dir and reuse them while the blocks are unchanged",
+    )
+    p.add_argument(
+        "--assign-from-run-id",
+        type=str,
+        default="",
+        help="Step 04 assign-only mode: keep this run's concepts and assign only new blocks to its stored centroids",
+    )
+    p.add_argument(
+        "--assign-drift-threshold",
+        type=float,
+        default=0.25,
+        help="Recluster instead when new blocks' mean centroid distance exceeds the fit's mean by this fraction",
+    )
+    p.add_argument(
+        "--warm-start-from-run-id",
+        type=str,
+        default="",
+        help="Initialize step 04 clustering once from this run's persisted centroids, projected into the new vocabulary",
+    )
+    p.add_argument(
+        "--vectorizer",
+        choices=["tfidf", "hashed"],
+        default="tfidf",
+        help="hashed: stream blocks through a HashingVectorizer and build the TF-IDF matrix on disk (out of core)",
+    )
+    p.add_argument("--hash-features", type=int, default=2 ** 20, help="Hash buckets for --vectorizer hashed")
+    p.add_argument("--vectorize-batch-size", type=int, default=5000, help="Blocks per cursor batch for --vectorizer hashed")
     p.add_argument("--resume", action="store_true")
     p.add_argument("--from-step", type=int, default=1)
     p.add_argument("--to-step", type=int, default=8)
@@ -50,6 +170,28 @@ def parse_args():
     p.add_argument("--include-locales", type=str, default="", help="Comma-separated locale prefixes, e.g. ru,pt-br,sw")
     p.add_argument("--allow-overwrite-run", action="store_true")
     p.add_argument("--recompute-titles-only", action="store_true")
+    p.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=1000,
+        help="Upserts per unordered bulk_write batch; 0 or 1 writes one document per round trip",
+    )
+    p.add_argument(
+        "--skip-unchanged-writes",
+        action="store_true",
+        help="Before each write batch, read stored content hashes and skip evidence blocks, atoms and QA units that did not change",
+    )
+    p.add_argument(
+        "--io-mode",
+        choices=["sync", "async"],
+        default="sync",
+        help="async overlaps cursor reads, chunking and bulk writes in steps 02-03",
+    )
+    p.add_argument("--async-batch-size", type=int, default=500, help="Source docs per cursor batch in async mode")
+    p.add_argument("--async-queue-size", type=int, default=4, help="Max in-flight batches per queue in async mode")
+    p.add_argument("--source-backend", choices=["mongo", "local"], default="mongo", help="Where vet_database is read from")
+    p.add_argument("--storage-backend", choices=["mongo", "local"], default="mongo", help="Where vet_analytics outputs are stored")
+    p.add_argument("--local-store-dir", type=str, default=".local_store", help="SQLite files for the local backend")
     return p.parse_args()
 
 
@@ -66,13 +208,41 @@ def _run_has_outputs(write_db, run_id: str) -> bool:
 
 def main():
     args = parse_args()
-    cfg = load_env_config()
+    cfg = load_env_config(require_mongo="mongo" in {args.source_backend, args.storage_backend})
     cfg.dry_run = args.dry_run
     cfg.limit = args.limit
     cfg.sample_per_collection = args.sample_per_collection
+    cfg.inventory_workers = args.inventory_workers
+    cfg.inventory_sampling = args.inventory_sampling
+    cfg.inventory_refresh = args.inventory_refresh
+    cfg.dedup_mode = args.dedup_mode
+    cfg.near_dup_threshold = args.near_dup_threshold
+    cfg.minhash_num_perm = args.minhash_num_perm
+    cfg.minhash_shingle_size = args.minhash_shingle_size
+    cfg.fused_scan = args.fused_scan
+    cfg.incremental = args.incremental
+    cfg.watermark_field = args.watermark_field
     cfg.chunk_size_chars = args.chunk_size_chars
     cfg.overlap_chars = args.overlap_chars
+    cfg.block_text_mode = args.block_text_mode
+    cfg.block_flush_size = args.block_flush_size
+    cfg.langid_cache_path = args.langid_cache_path
     cfg.k_clusters = args.k_clusters
+    cfg.cluster_engine = args.cluster_engine
+    cfg.cluster_sample_size = args.cluster_sample_size
+    cfg.minibatch_size = args.minibatch_size
+    cfg.k_candidates = [int(x) for x in args.k_candidates.split(",") if x.strip()]
+    cfg.auto_k_sample_size = args.auto_k_sample_size
+    cfg.auto_k_workers = args.auto_k_workers
+    cfg.svd_components = args.svd_components
+    cfg.artifacts_dir = args.artifacts_dir
+    cfg.persist_tfidf = args.persist_tfidf
+    cfg.assign_from_run_id = args.assign_from_run_id
+    cfg.assign_drift_threshold = args.assign_drift_threshold
+    cfg.warm_start_run_id = args.warm_start_from_run_id
+    cfg.vectorizer = args.vectorizer
+    cfg.hash_features = args.hash_features
+    cfg.vectorize_batch_size = args.vectorize_batch_size
     cfg.resume = args.resume
     cfg.from_step = args.from_step
     cfg.to_step = args.to_step
@@ -81,6 +251,14 @@ def main():
     cfg.include_locales = _parse_locales(args.include_locales)
     cfg.allow_overwrite_run = args.allow_overwrite_run
     cfg.recompute_titles_only = args.recompute_titles_only
+    cfg.write_batch_size = args.write_batch_size
+    cfg.skip_unchanged_writes = args.skip_unchanged_writes
+    cfg.io_mode = args.io_mode
+    cfg.async_batch_size = args.async_batch_size
+    cfg.async_queue_size = args.async_queue_size
+    cfg.source_backend = args.source_backend
+    cfg.storage_backend = args.storage_backend
+    cfg.local_store_dir = args.local_store_dir
 
     if cfg.recompute_titles_only:
         if not args.run_id:
@@ -91,13 +269,18 @@ def main():
         cfg.active_run_id = cfg.run_id
 
     logger = setup_logging(cfg.run_id)
-    mongo = connect_mongo(cfg.mongo_uri_read, cfg.mongo_uri_write, cfg.mongo_db_read, cfg.mongo_db_write)
+    if cfg.io_mode == "async" and "local" in {cfg.source_backend, cfg.storage_backend}:
+        logger.warning("--io-mode async needs the Mongo backend for sources and storage; falling back to sync")
+        cfg.io_mode = "sync"
+    mongo = connect_from_config(cfg)
 
     if args.run_id and not cfg.allow_overwrite_run and _run_has_outputs(mongo.write_db, cfg.run_id):
         logger.error("run_id=%s already has output docs; pass --allow-overwrite-run to overwrite", cfg.run_id)
         sys.exit(1)
 
-    ctx = {"config": cfg, "logger": logger, "mongo": mongo, "warnings": []}
+    index_report = ensure_indexes(mongo.write_db, dry_run=cfg.dry_run)
+
+    ctx = {"config": cfg, "logger": logger, "mongo": mongo, "warnings": [], "index_report": index_report}
     logger.info(
         "Starting run_id=%s active_run_id=%s steps=%s..%s include_locales=%s",
         cfg.run_id,
@@ -1,29 +1,23 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from collections import Counter
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+
+from pymongo.errors import OperationFailure
 
 from ..common.mongo import safe_upsert_many
-from ..common.schema_infer import infer_schema_profile
+from ..common.schema_infer import SchemaProfiler, profile_from_aggregate, schema_stats_pipeline
 
 STRUCTURED_HINTS = {
     "red_flags", "triage", "diagnostic_steps", "differentials", "symptoms", "protocol", "steps", "assessment"
 }
 
 
-def _get_dotted_value(doc, path):
-    cur = doc
-    for key in path.split("."):
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(key)
-        if cur is None:
-            return None
-    return cur
-
-
 def _classify(schema: Dict[str, Any]) -> Dict[str, Any]:
     fp = schema["field_profiles"]
     triggers = []
@@ -46,89 +40,226 @@ def _classify(schema: Dict[str, Any]) -> Dict[str, Any]:
     return {"collection_type": ctype, "classification_evidence": triggers}
 
 
-def run(ctx):
-    db = ctx["mongo"].read_db
-    wdb = ctx["mongo"].write_db
-    cfg = ctx["config"]
-    logger = ctx["logger"]
+def _trim_sample(s: Dict[str, Any]) -> Dict[str, Any]:
+    trimmed = {}
+    for k, v in s.items():
+        if k == "_id":
+            continue
+        if isinstance(v, str):
+            trimmed[k] = v[:300]
+        elif isinstance(v, (int, float, bool)) or v is None:
+            trimmed[k] = v
+        elif isinstance(v, list):
+            trimmed[k] = f"list[{len(v)}]"
+        elif isinstance(v, dict):
+            trimmed[k] = f"object[{len(v)} keys]"
+        else:
+            trimmed[k] = str(type(v).__name__)
+        if len(trimmed) >= 12:
+            break
+    return trimmed
 
-    out = []
-    sample_docs = []
-    for coll in db.list_collection_names():
-        c = db[coll]
-        count = c.count_documents({})
-        sample_n = min(cfg.sample_per_collection, count)
-        if cfg.limit and sample_n > cfg.limit:
-            sample_n = cfg.limit
-        samples = list(c.find({}, limit=sample_n))
-        stats = {"stats_available": False}
+
+def _sample_natural(c, sample_n: int):
+    # Stream the cursor through the profiler; only the 20-doc preview is held in memory.
+    profiler = SchemaProfiler()
+    preview = []
+    for doc in c.find({}, limit=sample_n):
+        profiler.add(doc)
+        if len(preview) < 20:
+            preview.append(doc)
+    schema = profiler.result()
+    title_dup = {}
+    for tf in schema.get("title_fields", [])[:1]:
+        title_dup = {"field": tf, "top_repeats": profiler.top_titles(tf, 5)}
+    return schema, title_dup, preview
+
+
+def _sample_server(c, sample_n: int):
+    rows = list(c.aggregate(schema_stats_pipeline(sample_n), allowDiskUse=True))
+    _, schema = profile_from_aggregate(rows)
+    title_dup = {}
+    for tf in schema.get("title_fields", [])[:1]:
+        top = c.aggregate([
+            {"$sample": {"size": sample_n}},
+            {"$match": {tf: {"$type": "string"}}},
+            {"$group": {"_id": f"${tf}", "n": {"$sum": 1}}},
+            {"$sort": {"n": -1}},
+            {"$limit": 5},
+        ])
+        title_dup = {"field": tf, "top_repeats": [(r["_id"], r["n"]) for r in top]}
+    preview = list(c.aggregate([{"$sample": {"size": min(20, sample_n)}}]))
+    return schema, title_dup, preview
+
+
+def _fingerprint(c, count: int, stats: Dict[str, Any], sample_n: int, sampling: str) -> Dict[str, Any]:
+    # Cheap change detector: count, newest _id and on-disk size, plus the knobs that shape the profile.
+    try:
+        newest = c.find_one({}, projection={"_id": 1}, sort=[("_id", -1)])
+    except OperationFailure:
+        newest = None
+    fp = {
+        "count": count,
+        "max_id": str(newest["_id"]) if newest else None,
+        "size": stats.get("size"),
+        "sample_size": sample_n,
+        "sampling": sampling,
+    }
+    fp["hash"] = hashlib.sha1(json.dumps(fp, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return fp
+
+
+def _cached_profile(wdb, coll: str, fingerprint: Dict[str, Any], run_id: str):
+    # Newest other run with this fingerprint; an overwrite rerun must not reuse its own partial output.
+    prev = wdb["inv_inventory"].find_one(
+        {"collection": coll, "fingerprint.hash": fingerprint["hash"], "run_id": {"$ne": run_id}},
+        sort=[("created_at", -1)],
+    )
+    if not prev:
+        return None, []
+    samples = []
+    for s in wdb["inv_samples"].find({"run_id": prev["run_id"], "collection": coll}):
+        s.pop("_id", None)
+        s["run_id"] = run_id
+        samples.append(s)
+    if prev.get("sample_size") and not samples:
+        return None, []
+    return prev, samples
+
+
+def _profile_collection(db, wdb, coll: str, cfg, logger) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    t0 = time.perf_counter()
+    c = db[coll]
+    sampling = cfg.inventory_sampling
+    if sampling == "server":
         try:
-            cs = db.command("collStats", coll)
-            stats = {
-                "stats_available": True,
-                "size": cs.get("size"),
-                "storageSize": cs.get("storageSize"),
-                "avgObjSize": cs.get("avgObjSize"),
-                "nindexes": cs.get("nindexes"),
-            }
-        except Exception:
-            pass
-        schema = infer_schema_profile(samples)
-        cls = _classify(schema)
-
-        title_dup = {}
-        for tf in schema.get("title_fields", [])[:1]:
-            vals = [_get_dotted_value(s, tf) for s in samples if isinstance(_get_dotted_value(s, tf), str)]
-            cnt = Counter(vals)
-            title_dup = {"field": tf, "top_repeats": cnt.most_common(5)}
+            count = c.estimated_document_count()
+        except (OperationFailure, NotImplementedError):
+            count = c.count_documents({})
+    else:
+        count = c.count_documents({})
+    sample_n = min(cfg.sample_per_collection, count)
+    if cfg.limit and sample_n > cfg.limit:
+        sample_n = cfg.limit
+    stats = {"stats_available": False}
+    try:
+        cs = db.command("collStats", coll)
+        stats = {
+            "stats_available": True,
+            "size": cs.get("size"),
+            "storageSize": cs.get("storageSize"),
+            "avgObjSize": cs.get("avgObjSize"),
+            "nindexes": cs.get("nindexes"),
+        }
+    except Exception:
+        pass
 
+    fingerprint = _fingerprint(c, count, stats, sample_n, sampling)
+    prev, samples = (None, []) if cfg.inventory_refresh else _cached_profile(wdb, coll, fingerprint, cfg.run_id)
+    if prev:
+        elapsed = time.perf_counter() - t0
+        profile_seconds = prev.get("profile_seconds", 0.0)
         doc = {
             "inventory_id": f"inv::{coll}",
             "run_id": cfg.run_id,
             "collection": coll,
             "count": count,
             "sample_size": sample_n,
-            "schema": schema,
-            "classification": cls,
+            "schema": prev["schema"],
+            "classification": prev["classification"],
             "coll_stats": stats,
-            "suspected_duplicates": title_dup,
+            "suspected_duplicates": prev.get("suspected_duplicates", {}),
+            "sampling": prev.get("sampling", sampling),
+            "fingerprint": fingerprint,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "profile_seconds": profile_seconds,
+            "cache": {
+                "status": "reused",
+                "from_run_id": prev["run_id"],
+                "seconds": round(elapsed, 3),
+                "saved_seconds": round(max(0.0, profile_seconds - elapsed), 3),
+            },
         }
-        out.append(doc)
-
-        for i, s in enumerate(samples[: min(20, len(samples))]):
-            trimmed = {}
-            for k, v in s.items():
-                if k == "_id":
-                    continue
-                if isinstance(v, str):
-                    trimmed[k] = v[:300]
-                elif isinstance(v, (int, float, bool)) or v is None:
-                    trimmed[k] = v
-                elif isinstance(v, list):
-                    trimmed[k] = f"list[{len(v)}]"
-                elif isinstance(v, dict):
-                    trimmed[k] = f"object[{len(v)} keys]"
-                else:
-                    trimmed[k] = str(type(v).__name__)
-                if len(trimmed) >= 12:
-                    break
-            sample_docs.append({
-                "sample_id": f"sample::{coll}::{i}",
-                "run_id": cfg.run_id,
-                "collection": coll,
-                "source_doc_id": str(s.get("_id")),
-                "sample": trimmed,
-            })
-
-    safe_upsert_many(wdb["inv_inventory"], out, "inventory_id", cfg.run_id, dry_run=cfg.dry_run)
-    safe_upsert_many(wdb["inv_samples"], sample_docs, "sample_id", cfg.run_id, dry_run=cfg.dry_run)
+        return doc, samples
+
+    if sampling == "server" and sample_n > 0:
+        try:
+            schema, title_dup, samples = _sample_server(c, sample_n)
+        except (OperationFailure, NotImplementedError) as exc:
+            logger.warning("Server-side sampling failed for %s (%s); using natural-order sample", coll, exc)
+            sampling = "natural"
+    else:
+        sampling = "natural"
+    if sampling == "natural":
+        schema, title_dup, samples = _sample_natural(c, sample_n)
+    cls = _classify(schema)
+    elapsed = round(time.perf_counter() - t0, 3)
+
+    doc = {
+        "inventory_id": f"inv::{coll}",
+        "run_id": cfg.run_id,
+        "collection": coll,
+        "count": count,
+        "sample_size": sample_n,
+        "schema": schema,
+        "classification": cls,
+        "coll_stats": stats,
+        "suspected_duplicates": title_dup,
+        "sampling": sampling,
+        "fingerprint": fingerprint,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "profile_seconds": elapsed,
+        "cache": {
+            "status": "refresh" if cfg.inventory_refresh else "miss",
+            "from_run_id": None,
+            "seconds": elapsed,
+            "saved_seconds": 0.0,
+        },
+    }
+
+    sample_docs = []
+    for i, s in enumerate(samples):
+        sample_docs.append({
+            "sample_id": f"sample::{coll}::{i}",
+            "run_id": cfg.run_id,
+            "collection": coll,
+            "source_doc_id": str(s.get("_id")),
+            "sample": _trim_sample(s),
+        })
+    return doc, sample_docs
+
+
+def run(ctx):
+    db = ctx["mongo"].read_db
+    wdb = ctx["mongo"].write_db
+    cfg = ctx["config"]
+    logger = ctx["logger"]
+
+    # Sorted names plus executor.map keep inv_inventory and the reports in a stable order.
+    names = sorted(db.list_collection_names())
+    workers = max(1, min(cfg.inventory_workers, len(names) or 1))
+    out = []
+    sample_docs = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for doc, samples in pool.map(lambda coll: _profile_collection(db, wdb, coll, cfg, logger), names):
+            out.append(doc)
+            sample_docs.extend(samples)
+
+    safe_upsert_many(wdb["inv_inventory"], out, "inventory_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)
+    safe_upsert_many(wdb["inv_samples"], sample_docs, "sample_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)
 
     Path("reports").mkdir(exist_ok=True)
     Path("reports/inventory.json").write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    rows = ["| collection | count | type | sample |", "|---|---:|---|---:|"]
+    rows = ["| collection | count | type | sample | cache | seconds | saved |", "|---|---:|---|---:|---|---:|---:|"]
     for d in out:
-        rows.append(f"| {d['collection']} | {d['count']} | {d['classification']['collection_type']} | {d['sample_size']} |")
+        cache = d["cache"]
+        rows.append(
+            f"| {d['collection']} | {d['count']} | {d['classification']['collection_type']} | {d['sample_size']} "
+            f"| {cache['status']} | {cache['seconds']:.2f} | {cache['saved_seconds']:.2f} |"
+        )
+    reused = [d for d in out if d["cache"]["status"] == "reused"]
+    saved_total = sum(d["cache"]["saved_seconds"] for d in out)
     content_fields = []
     for d in out:
         for f in d["schema"].get("content_fields", []):
@@ -141,9 +272,13 @@ def run(ctx):
             lang_summary.append(f"- {d['collection']}.{lf}: {cov:.1%}")
 
     md = "\n".join([
-        "# Inventory Summary", "", *rows, "", "## Top content fields by avg length", *[f"- {a}: {b:.1f}" for a, b in content_fields],
+        "# Inventory Summary", "", *rows, "",
+        f"Profile cache: {len(reused)}/{len(out)} collections reused (fingerprint match), ~{saved_total:.1f}s saved.", "", "## Top content fields by avg length", *[f"- {a}: {b:.1f}" for a, b in content_fields],
         "", "## Language field coverage", *(lang_summary or ["- none detected"]),
     ])
     Path("reports/inventory.md").write_text(md, encoding="utf-8")
-    logger.info("Inventory done: %d collections", len(out))
+    logger.info(
+        "Inventory done: %d collections (%d workers), %d reused from cache, ~%.1fs saved",
+        len(out), workers, len(reused), saved_total,
+    )
     ctx["inventory"] = out
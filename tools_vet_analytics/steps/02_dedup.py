@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from collections import defaultdict
+from collections import Counter, defaultdict
 from pathlib import Path
 
+from ..common.evidence import SOURCE_PROJECTION_FIELDS, EvidenceCollector
 from ..common.hashing import sha1_text
+from ..common.minhash import NearDupIndex
 from ..common.mongo import safe_upsert_many
 from ..common.normalize import normalize_ru_text
+from ..common.source_scan import scan_sources, scan_sources_async
+from ..common.watermarks import plan_incremental
+
+DEDUP_PROJECTION_FIELDS = ("title", "name")
+# Full doc -> norm_hash membership of incremental runs; dedup_groups keep only 100 doc_ids.
+MEMBERS_COLLECTION = "dedup_members"
 
 
 def _get_dotted_value(doc, path):
@@ -26,6 +35,135 @@ def _load_inventory(ctx):
     return list(ctx["mongo"].write_db["inv_inventory"].find({"run_id": ctx["config"].active_run_id or ctx["config"].run_id}))
 
 
+def _new_group():
+    return {"count": 0, "doc_ids": [], "titles": [], "snippet": "", "source_collection": ""}
+
+
+def _add_doc(groups, doc, coll: str, content_field: str, near: NearDupIndex | None = None) -> str | None:
+    raw = _get_dotted_value(doc, content_field) or ""
+    if not isinstance(raw, str) or not raw.strip():
+        return None
+    norm = normalize_ru_text(raw)
+    h = sha1_text(norm)
+    g = groups[h]
+    if near is not None and g["count"] == 0:
+        # One signature per distinct normalized text; exact copies share it.
+        near.add(h, norm)
+    g["count"] += 1
+    g["source_collection"] = coll
+    if len(g["doc_ids"]) < 100:
+        g["doc_ids"].append(str(doc.get("_id")))
+    t = doc.get("title") or doc.get("name")
+    if isinstance(t, str) and len(g["titles"]) < 50:
+        g["titles"].append(t)
+    if not g["snippet"]:
+        g["snippet"] = norm[:300]
+    return h
+
+
+def _member_doc(run_id: str, coll: str, doc_id: str, h: str) -> dict:
+    return {"member_id": f"{coll}::{doc_id}", "run_id": run_id, "source_collection": coll, "doc_id": doc_id, "norm_hash": h}
+
+
+def _merge_previous_groups(groups, wdb, cfg, plan) -> int:
+    # Carry forward the previous run's members minus the documents that were re-read.
+    prev_query = {"run_id": plan.prev_run_id, "source_collection": plan.collection}
+    if wdb[MEMBERS_COLLECTION].find_one(prev_query) is None:
+        return _merge_previous_doc_ids(groups, wdb, plan)
+    counts = Counter()
+    kept = defaultdict(list)
+
+    def carried():
+        for m in wdb[MEMBERS_COLLECTION].find(prev_query, {"_id": 0, "doc_id": 1, "norm_hash": 1}):
+            if m["doc_id"] in plan.changed_ids:
+                continue
+            h = m["norm_hash"]
+            counts[h] += 1
+            if len(kept[h]) < 100:
+                kept[h].append(m["doc_id"])
+            yield _member_doc(cfg.run_id, plan.collection, m["doc_id"], h)
+
+    safe_upsert_many(
+        wdb[MEMBERS_COLLECTION], carried(), "member_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size
+    )
+    prev_groups = {
+        d["norm_hash"]: d
+        for d in wdb["dedup_groups"].find({
+            "run_id": plan.prev_run_id,
+            "dedup_type": "raw_text",
+            "source_collection": plan.collection,
+            "method": {"$ne": "near_minhash"},
+        })
+        if d["norm_hash"] in counts
+    }
+    for h, count in counts.items():
+        d = prev_groups.get(h, {})
+        g = groups[h]
+        g["count"] += count
+        g["doc_ids"] = (kept[h] + g["doc_ids"])[:100]
+        g["titles"] = (d.get("titles", []) + g["titles"])[:50]
+        g["snippet"] = d.get("sample_snippet") or g["snippet"]
+        g["source_collection"] = g["source_collection"] or plan.collection
+    return len(counts)
+
+
+def _merge_previous_doc_ids(groups, wdb, plan) -> int:
+    # Runs from before dedup_members: only the first 100 doc_ids of a group are known, so
+    # counts of larger groups can drift until the next full run.
+    merged = 0
+    for d in wdb["dedup_groups"].find({
+        "run_id": plan.prev_run_id,
+        "dedup_type": "raw_text",
+        "source_collection": plan.collection,
+        "method": {"$ne": "near_minhash"},
+    }):
+        prev_ids = d.get("doc_ids", [])
+        kept = [i for i in prev_ids if i not in plan.changed_ids]
+        count = d.get("count", 0) - (len(prev_ids) - len(kept))
+        if count <= 0:
+            continue
+        g = groups[d["norm_hash"]]
+        g["count"] += count
+        g["doc_ids"] = (kept + g["doc_ids"])[:100]
+        g["titles"] = (d.get("titles", []) + g["titles"])[:50]
+        g["snippet"] = d.get("sample_snippet") or g["snippet"]
+        g["source_collection"] = g["source_collection"] or plan.collection
+        merged += 1
+    return merged
+
+
+def _near_groups(cfg, near: NearDupIndex, groups) -> list:
+    out = []
+    for members in near.groups():
+        hashes = [h for h, _ in members]
+        sims = [sim for _, sim in members[1:]]
+        rep = groups[hashes[0]]
+        doc_ids, titles = [], []
+        for h in hashes:
+            doc_ids.extend(groups[h]["doc_ids"])
+            titles.extend(groups[h]["titles"])
+        gid = sha1_text("near|" + "|".join(sorted(hashes)))
+        out.append({
+            "dedup_id": f"near::{gid}",
+            "run_id": cfg.run_id,
+            "dedup_type": "raw_text",
+            "method": "near_minhash",
+            "group_id": gid,
+            "representative_hash": hashes[0],
+            "norm_hashes": hashes[:100],
+            "members": [{"norm_hash": h, "similarity": round(sim, 4)} for h, sim in members[:100]],
+            "similarity": {"min": round(min(sims), 4), "mean": round(sum(sims) / len(sims), 4)},
+            "threshold": cfg.near_dup_threshold,
+            "num_perm": cfg.minhash_num_perm,
+            "count": sum(groups[h]["count"] for h in hashes),
+            "source_collection": rep["source_collection"],
+            "doc_ids": doc_ids[:100],
+            "titles": titles[:50],
+            "sample_snippet": rep["snippet"],
+        })
+    return out
+
+
 def run(ctx):
     cfg = ctx["config"]
     rdb = ctx["mongo"].read_db
@@ -43,29 +181,45 @@ def run(ctx):
     selected = candidates[:3]
     ctx["selected_sources"] = selected
 
-    groups = defaultdict(lambda: {"count": 0, "doc_ids": [], "titles": [], "snippet": "", "source_collection": ""})
-    for coll, _, content_field in selected:
-        c = rdb[coll]
-        limit = cfg.limit or 0
-        cur = c.find({}, {content_field: 1, "title": 1, "name": 1})
-        if limit:
-            cur = cur.limit(limit)
-        for doc in cur:
-            raw = _get_dotted_value(doc, content_field) or ""
-            if not isinstance(raw, str) or not raw.strip():
-                continue
-            norm = normalize_ru_text(raw)
-            h = sha1_text(norm)
-            g = groups[h]
-            g["count"] += 1
-            g["source_collection"] = coll
-            if len(g["doc_ids"]) < 100:
-                g["doc_ids"].append(str(doc.get("_id")))
-            t = doc.get("title") or doc.get("name")
-            if isinstance(t, str) and len(g["titles"]) < 50:
-                g["titles"].append(t)
-            if not g["snippet"]:
-                g["snippet"] = norm[:300]
+    groups = defaultdict(_new_group)
+    near = None
+    if cfg.dedup_mode == "near":
+        near = NearDupIndex(cfg.minhash_num_perm, cfg.near_dup_threshold, cfg.minhash_shingle_size)
+    plans = plan_incremental(ctx, selected) if cfg.incremental else {}
+    members = []
+
+    def add_docs(docs, coll, content_field):
+        for doc in docs:
+            h = _add_doc(groups, doc, coll, content_field, near)
+            if plans and h is not None:
+                members.append(_member_doc(cfg.run_id, coll, str(doc.get("_id")), h))
+
+    consumers = [add_docs]
+    if plans:
+        consumers.insert(0, lambda docs, coll, content_field: plans[coll].track(docs, coll, content_field))
+    fields = DEDUP_PROJECTION_FIELDS
+    collector = None
+    if cfg.fused_scan and cfg.from_step <= 3 <= cfg.to_step:
+        # Chunk for step 03 during the same pass; step 03 then only writes the blocks.
+        collector = EvidenceCollector(cfg, wdb=wdb)
+        collector.sources = list(selected)
+        consumers.append(collector.add_docs)
+        fields = SOURCE_PROJECTION_FIELDS
+    filters = {coll: plan.filter for coll, plan in plans.items()}
+    if cfg.io_mode == "async":
+        asyncio.run(scan_sources_async(cfg, selected, consumers, fields, filters=filters))
+    else:
+        scan_sources(rdb, selected, consumers, fields, limit=cfg.limit, filters=filters)
+    if collector is not None:
+        ctx["evidence_collector"] = collector
+    if plans:
+        safe_upsert_many(
+            wdb[MEMBERS_COLLECTION], members, "member_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size
+        )
+    for plan in plans.values():
+        if plan.prev_run_id:
+            merged = _merge_previous_groups(groups, wdb, cfg, plan)
+            ctx["logger"].info("Dedup %s: %d changed docs, %d groups carried from run %s", plan.collection, len(plan.changed_ids), merged, plan.prev_run_id)
 
     out = []
     for h, g in groups.items():
@@ -73,6 +227,7 @@ def run(ctx):
             "dedup_id": f"raw::{h}",
             "run_id": cfg.run_id,
             "dedup_type": "raw_text",
+            "method": "exact",
             "norm_hash": h,
             "count": g["count"],
             "source_collection": g["source_collection"],
@@ -81,9 +236,27 @@ def run(ctx):
             "sample_snippet": g["snippet"],
         })
 
-    safe_upsert_many(wdb["dedup_groups"], out, "dedup_id", cfg.run_id, dry_run=cfg.dry_run)
-    Path("reports/dedup_raw_text.json").write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    near_out = _near_groups(cfg, near, groups) if near is not None else []
+
+    safe_upsert_many(
+        wdb["dedup_groups"], out + near_out, "dedup_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size
+    )
+    Path("reports/dedup_raw_text.json").write_text(json.dumps(out + near_out, ensure_ascii=False, indent=2), encoding="utf-8")
     md = ["# Raw Text Dedup", "", f"groups: {len(out)}", "", "Top duplicates:"]
     for d in sorted(out, key=lambda x: x["count"], reverse=True)[:20]:
         md.append(f"- {d['norm_hash'][:10]}... count={d['count']} collection={d['source_collection']}")
+    if near is not None:
+        md += [
+            "",
+            "## Near duplicates (MinHash/LSH)",
+            "",
+            f"threshold={cfg.near_dup_threshold} num_perm={cfg.minhash_num_perm} bands={near.bands} rows={near.rows}",
+            f"groups: {len(near_out)}, distinct texts covered: {sum(len(d['norm_hashes']) for d in near_out)}",
+            "",
+        ]
+        for d in sorted(near_out, key=lambda x: x["count"], reverse=True)[:20]:
+            md.append(
+                f"- {d['representative_hash'][:10]}... texts={len(d['norm_hashes'])} count={d['count']} "
+                f"min_sim={d['similarity']['min']:.2f} mean_sim={d['similarity']['mean']:.2f}"
+            )
     Path("reports/dedup_raw_text.md").write_text("\n".join(md), encoding="utf-8")
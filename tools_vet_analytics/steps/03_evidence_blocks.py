@@ -1,57 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from collections import Counter
 from pathlib import Path
 
-from ..common.hashing import sha1_text
-from ..common.mongo import safe_upsert_many
-from ..common.normalize import split_chunks
-from ..common.tfidf import stopword_hit_count
-
-
-INVALID_LANG = {"", "none", "und"}
-
-
-def _get_dotted_value(doc, path):
-    cur = doc
-    for key in path.split("."):
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(key)
-        if cur is None:
-            return None
-    return cur
-
-
-def _locale_matches_prefix(locale: str, include_locales: list[str]) -> bool:
-    if not include_locales:
-        return True
-    norm = (locale or "und").strip().lower()
-    return any(norm.startswith(pref) for pref in include_locales)
-
-
-def _heuristic_locale(text: str) -> str:
-    sample = (text or "")[:1500].lower()
-    scores = {
-        "ru": stopword_hit_count(sample, "ru"),
-        "pt": stopword_hit_count(sample, "pt"),
-        "sw": stopword_hit_count(sample, "sw"),
-    }
-    best = max(scores, key=scores.get)
-    return best if scores[best] >= 5 else "und"
-
+from ..common.aio import async_safe_upsert_many
+from ..common.evidence import SOURCE_PROJECTION_FIELDS, EvidenceCollector, write_blocks
+from ..common.source_scan import scan_sources, scan_sources_async
+from ..common.watermarks import carried_blocks, plan_incremental, record_watermarks
+
+
+async def _write_blocks_async(cfg, amongo, blocks, report) -> None:
+    await async_safe_upsert_many(
+        amongo.write_db["evidence_blocks"],
+        blocks,
+        "block_id",
+        cfg.run_id,
+        dry_run=cfg.dry_run,
+        batch_size=cfg.write_batch_size,
+        report=report,
+        diff_field="build_hash" if cfg.skip_unchanged_writes else None,
+    )
 
-def _effective_locale(doc, text: str) -> str:
-    lang_tag = str(doc.get("lang_tag") or "").strip().lower()
-    if lang_tag:
-        return lang_tag
 
-    language = str(doc.get("language") or doc.get("lang") or doc.get("locale") or doc.get("source_locale") or "").strip().lower()
-    if language and language not in INVALID_LANG:
-        return language
+def _carry_forward(wdb, cfg, plan, stats, report) -> int:
+    def blocks():
+        for b in carried_blocks(wdb, plan, cfg.run_id):
+            stats["locale_count"][b.get("source_locale") or "und"] += 1
+            stats["count"] += 1
+            stats["chars"] += b.get("char_len", 0)
+            yield b
 
-    return _heuristic_locale(text)
+    return write_blocks(wdb, cfg, blocks(), report)
 
 
 def run(ctx):
@@ -61,60 +41,74 @@ def run(ctx):
     read_run_id = cfg.active_run_id or cfg.run_id
     selected = ctx.get("selected_sources", [])
 
-    out = []
-    locale_count = Counter()
-    include_locales = cfg.include_locales or []
-
-    for coll, _, content_field in selected:
-        proj = {
-            content_field: 1,
-            "title": 1,
-            "name": 1,
-            "language": 1,
-            "lang": 1,
-            "lang_tag": 1,
-            "locale": 1,
-            "source_locale": 1,
-        }
-        cur = rdb[coll].find({}, proj)
+    plans = plan_incremental(ctx, selected) if cfg.incremental else {}
+    filters = {coll: plan.filter for coll, plan in plans.items()}
+    consumers = []
+    if plans:
+        consumers.append(lambda docs, coll, content_field: plans[coll].track(docs, coll, content_field))
+
+    # A fused scan in step 02 already chunked these sources (and, when streaming, wrote
+    # most of them); only the remaining write is left.
+    collector = ctx.pop("evidence_collector", None)
+    if collector is not None and collector.sources == selected:
+        collector.finish()
+    elif cfg.io_mode == "async":
+        collector = EvidenceCollector(cfg, keep_blocks=False)
+        asyncio.run(
+            scan_sources_async(
+                cfg,
+                selected,
+                consumers + [collector.add_docs],
+                SOURCE_PROJECTION_FIELDS,
+                sink=lambda amongo, blocks: _write_blocks_async(cfg, amongo, blocks, collector.write_report),
+                filters=filters,
+            )
+        )
+    else:
+        collector = EvidenceCollector(cfg, wdb=wdb)
+        scan_sources(rdb, selected, consumers + [collector.add_docs], SOURCE_PROJECTION_FIELDS, limit=cfg.limit, filters=filters)
+        collector.finish()
+    stats = collector.stats
+    write_report = collector.write_report
+
+    carried = {}
+    if plans:
+        new_count = stats["count"]
+        for coll, plan in plans.items():
+            carried[coll] = _carry_forward(wdb, cfg, plan, stats, write_report)
         if cfg.limit:
-            cur = cur.limit(cfg.limit)
-        for doc in cur:
-            text = _get_dotted_value(doc, content_field)
-            if not isinstance(text, str) or not text.strip():
-                continue
-            locale = _effective_locale(doc, text)
-            if not _locale_matches_prefix(locale, include_locales):
-                continue
+            ctx["logger"].warning("--limit with --incremental: watermarks not advanced")
+        else:
+            record_watermarks(wdb, cfg, plans, {coll: {"carried_blocks": n} for coll, n in carried.items()})
+        ctx["logger"].info("Incremental evidence: %d new blocks, %d carried forward", new_count, sum(carried.values()))
 
-            chunks = split_chunks(text, cfg.chunk_size_chars, cfg.overlap_chars)
-            locale_count[locale] += len(chunks)
-            for i, chunk in enumerate(chunks):
-                bh = sha1_text(chunk)
-                block_id = sha1_text(f"{coll}|{doc.get('_id')}|{i}|{bh}")
-                out.append(
-                    {
-                        "block_id": block_id,
-                        "run_id": cfg.run_id,
-                        "source_collection": coll,
-                        "source_doc_id": str(doc.get("_id")),
-                        "title": doc.get("title") or doc.get("name"),
-                        "source_locale": locale,
-                        "text": chunk,
-                        "text_hash": bh,
-                        "char_len": len(chunk),
-                        "block_index": i,
-                    }
-                )
+    ctx.setdefault("write_reports", []).append(write_report.summary())
 
-    safe_upsert_many(wdb["evidence_blocks"], out, "block_id", cfg.run_id, dry_run=cfg.dry_run)
-    md = ["# Evidence Blocks", "", f"blocks: {len(out)}", "", "Locales:"]
+    locale_count = stats["locale_count"]
+    md = ["# Evidence Blocks", "", f"blocks: {stats['count']}", "", "Locales:"]
     for k, v in locale_count.items():
         md.append(f"- {k}: {v}")
-    if out:
-        md.append(f"\nAverage length: {sum(x['char_len'] for x in out)/len(out):.1f}")
+    if stats["count"]:
+        md.append(f"\nAverage length: {stats['chars']/stats['count']:.1f}")
+    lid = collector.langid.stats
+    md.append(f"\nLanguage ID: {lid['detected']} detected, {lid['cache_hits']} from cache")
+    if collector.streaming:
+        md.append(f"\nStreamed in {stats['flushes']} flushes of up to {cfg.block_flush_size} blocks")
+    if cfg.skip_unchanged_writes:
+        md.append(f"\nUnchanged blocks skipped: {write_report.skipped}")
+    if plans:
+        md.append("\nIncremental (carried forward from previous run):")
+        for coll, n in carried.items():
+            md.append(f"- {coll}: {len(plans[coll].changed_ids)} docs re-read, {n} blocks carried from {plans[coll].prev_run_id or '-'}")
     Path("reports/evidence_blocks.md").write_text("\n".join(md), encoding="utf-8")
+    report = {"count": stats["count"], "locale_distribution": dict(locale_count), "langid": dict(lid)}
+    if plans:
+        report["carried_forward"] = carried
+    if collector.streaming:
+        report["flushes"] = stats["flushes"]
+    if cfg.skip_unchanged_writes:
+        report["skipped_unchanged"] = write_report.skipped
     Path("reports/evidence_blocks.json").write_text(
-        json.dumps({"count": len(out), "locale_distribution": dict(locale_count)}, ensure_ascii=False, indent=2),
+        json.dumps(report, ensure_ascii=False, indent=2),
         encoding="utf-8",
     )
@@ -1,17 +1,47 @@
 from __future__ import annotations
 
 import json
-from collections import Counter, defaultdict
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
 
 import numpy as np
-from sklearn.cluster import KMeans
+from scipy.optimize import linear_sum_assignment
+from sklearn.preprocessing import normalize
 
+from ..common.block_text import BLOCK_TEXT_FIELDS, BlockTextResolver
+from ..common.artifacts import (
+    cached_tfidf,
+    corpus_hash,
+    load_array,
+    load_block_embedding,
+    load_clustering,
+    load_json,
+    load_vectorizer,
+    save_array,
+    save_block_embedding,
+    save_clustering,
+    save_vectorizer,
+)
+from ..common.clustering import ClusterResult, assign_nearest, fit_clusters, reduce_dimensions, sweep_k
+from ..common.hashed_tfidf import HashedTfidfWriter, bucket_terms
+from ..common.hashing import sha1_text
 from ..common.mongo import safe_upsert_many
-from ..common.tfidf import build_tfidf, get_stopwords_for_locales
+from ..common.tfidf import (
+    cluster_members,
+    cluster_top_terms,
+    get_stopwords_for_locales,
+    nearest_to_centroid,
+)
 
 
+# Member blocks per cluster whose texts name the hashed keyword buckets.
+HASHED_NAME_SAMPLE = 50
+
+# Minimum cosine similarity between a previous (projected) centroid and its warm-started successor
+# for the successor to keep the previous concept_id.
+WARM_START_MIN_SIMILARITY = 0.5
+
 FALLBACK_TITLE = {
     "ru": "ветеринария: тема {cluster_index}",
     "pt": "veterinária: tema {cluster_index}",
@@ -50,33 +80,427 @@ def _title_guess(keywords: list[str], cluster_index: int, locale: str, stopwords
     return ", ".join(usable[:5])
 
 
+def _cluster_params(cfg) -> dict:
+    return {
+        "k_clusters": cfg.k_clusters,
+        "k_candidates": cfg.k_candidates or [],
+        "engine": cfg.cluster_engine,
+        "sample_size": cfg.cluster_sample_size,
+        "minibatch_size": cfg.minibatch_size,
+        "auto_k_sample_size": cfg.auto_k_sample_size,
+        "svd_components": cfg.svd_components,
+        "warm_start_run_id": cfg.warm_start_run_id,
+        "vectorizer": cfg.vectorizer,
+        "hash_features": cfg.hash_features if cfg.vectorizer == "hashed" else None,
+    }
+
+
+def _load_fit(cfg, run_ids, key, mat, blocks):
+    hit = load_clustering(cfg.artifacts_dir, run_ids, key)
+    if hit is None:
+        return None
+    labels, centers, meta = hit
+    X = mat
+    if cfg.svd_components and meta.get("reduction", {}).get("components"):
+        emb = load_block_embedding(cfg.artifacts_dir, meta["run_id"])
+        if emb is None or emb[0] != [b["block_id"] for b in blocks]:
+            return None
+        X = emb[1]
+    clustering = ClusterResult(labels=labels, centers=centers, **meta["clustering"])
+    clustering.extra = {**clustering.extra, "from_run_id": meta["run_id"]}
+    return X, clustering, meta.get("auto_k"), meta.get("reduction") or {}
+
+
+def _write_concepts(wdb, cfg, out):
+    safe_upsert_many(wdb["kb_concepts"], out, "concept_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)
+    Path("reports/concepts_summary.json").write_text(json.dumps(out, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    Path("reports/concepts_summary.md").write_text(
+        "# Concepts\n\n" + "\n".join(f"- {d['concept_id']} ({d['block_count']} blocks): {d['title_guess']}" for d in out),
+        encoding="utf-8",
+    )
+
+
+def _block_texts(ctx, read_run_id, blocks):
+    if ctx["config"].vectorizer != "hashed":
+        return BlockTextResolver(ctx["mongo"].read_db).texts(blocks)
+    # Hashed mode keeps blocks without their inline text; read it back for just these blocks.
+    ids = [b["block_id"] for b in blocks]
+    full = {}
+    projection = {f: 1 for f in ("block_id", *BLOCK_TEXT_FIELDS)}
+    for i in range(0, len(ids), 1000):
+        for d in ctx["mongo"].write_db["evidence_blocks"].find({"run_id": read_run_id, "block_id": {"$in": ids[i:i + 1000]}}, projection):
+            full[d["block_id"]] = d
+    return BlockTextResolver(ctx["mongo"].read_db).texts([full[bid] for bid in ids])
+
+
+def _hashed_matrix(ctx, read_run_id, blocks, locales):
+    """Stream block texts from the cursor through HashedTfidfWriter; row i is blocks[i]."""
+    cfg = ctx["config"]
+    include_locales = cfg.include_locales or []
+    writer = HashedTfidfWriter(cfg.artifacts_dir, cfg.run_id, "blocks_hashed", n_features=cfg.hash_features, locales=locales)
+    resolver = BlockTextResolver(ctx["mongo"].read_db)
+    projection = {f: 1 for f in ("block_id", "source_locale", *BLOCK_TEXT_FIELDS)}
+    batch = []
+
+    def flush():
+        start = writer.n_rows
+        if [b["block_id"] for b in batch] != [b["block_id"] for b in blocks[start:start + len(batch)]]:
+            raise RuntimeError("evidence_blocks changed while step 04 was reading them; rerun the step")
+        writer.add(resolver.texts(batch))
+        batch.clear()
+
+    # Same order as run()'s read, served by the (run_id, block_id) index.
+    cursor = (
+        ctx["mongo"].write_db["evidence_blocks"]
+        .find({"run_id": read_run_id}, projection)
+        .sort("block_id", 1)
+        .batch_size(cfg.vectorize_batch_size)
+    )
+    for b in cursor:
+        if _locale_matches_prefix(b.get("source_locale", "und"), include_locales):
+            batch.append(b)
+            if len(batch) >= cfg.vectorize_batch_size:
+                flush()
+    if batch:
+        flush()
+    if writer.n_rows != len(blocks):
+        raise RuntimeError("evidence_blocks changed while step 04 was reading them; rerun the step")
+    mat = writer.finish()
+    return writer.hv, mat, writer.stats, writer.buckets
+
+
+def _assign_only(ctx, blocks, read_run_id):
+    """Assign blocks that are new since cfg.assign_from_run_id to its stored centroids.
+
+    Returns (concept docs, info), or (None, info) when the previous fit is missing or the
+    new blocks drift too far from it and a full recluster is needed.
+    """
+    cfg = ctx["config"]
+    src = cfg.assign_from_run_id
+    base = cfg.artifacts_dir
+    info = {"from_run_id": src}
+    loaded = load_vectorizer(base, src, "blocks_tfidf")
+    fit = load_clustering(base, [src], None)
+    prev_ids = load_json(base, src, "cluster_block_ids")
+    prev_concepts = {d["cluster_index"]: d for d in ctx["mongo"].write_db["kb_concepts"].find({"run_id": src})}
+    if loaded is None or fit is None or prev_ids is None or not prev_concepts:
+        info["fallback"] = "no persisted vectorizer, cluster fit or concepts (run step 04 with --persist-tfidf)"
+        return None, info
+    vec, vec_meta = loaded
+    prev_labels, centers, meta = fit
+    components = None
+    if (meta.get("reduction") or {}).get("components"):
+        components = load_array(base, src, "svd_components", mmap=False)
+        if components is None:
+            info["fallback"] = "svd_components missing"
+            return None, info
+    metric = meta["clustering"].get("extra", {}).get("metric", "euclidean")
+
+    prev_label = dict(zip(prev_ids, prev_labels.tolist()))
+    labels = np.array([prev_label.get(b["block_id"], -1) for b in blocks], dtype=np.int32)
+    new_idx = np.flatnonzero(labels < 0)
+    dist = np.zeros(0)
+    if len(new_idx):
+        new_blocks = [blocks[i] for i in new_idx]
+        X = vec.transform(_block_texts(ctx, read_run_id, new_blocks))
+        if components is not None:
+            X = normalize(np.asarray(X @ components.T)).astype(np.float32)
+        elif metric == "cosine":
+            X = normalize(X)
+        labels[new_idx], dist = assign_nearest(X, centers, metric=metric)
+
+    baseline = meta.get("mean_distance") or meta["clustering"]["inertia"] / max(1, len(prev_ids))
+    new_mean = float(dist.mean()) if len(dist) else 0.0
+    drift = new_mean / baseline - 1.0 if baseline > 0 else 0.0
+    info.update(
+        {
+            "kept_blocks": len(blocks) - len(new_idx),
+            "new_blocks": len(new_idx),
+            "removed_blocks": len(prev_ids) - (len(blocks) - len(new_idx)),
+            "baseline_mean_distance": round(baseline, 6),
+            "new_mean_distance": round(new_mean, 6),
+            "drift": round(drift, 6),
+            "drift_threshold": cfg.assign_drift_threshold,
+        }
+    )
+    if drift > cfg.assign_drift_threshold:
+        info["fallback"] = "drift above threshold"
+        return None, info
+
+    # Concepts keep their ids, titles and keywords; only membership moves.
+    now = datetime.now(timezone.utc).isoformat()
+    is_new = np.zeros(len(blocks), dtype=bool)
+    is_new[new_idx] = True
+    present = {b["block_id"] for b in blocks}
+    members = cluster_members(labels, len(centers))
+    out = []
+    for ci, idxs in enumerate(members):
+        if not len(idxs):
+            continue
+        loc_dist = Counter((blocks[ii].get("source_locale", "und") or "und") for ii in idxs)
+        prev = prev_concepts.get(ci)
+        if prev is None:
+            dominant_locale = loc_dist.most_common(1)[0][0]
+            prev = {
+                "concept_id": f"cpt_{cfg.run_id}_{ci}",
+                "title_guess": _fallback_title(ci, dominant_locale),
+                "top_keywords": [],
+                "rep_block_ids": [],
+                "cluster_index": ci,
+                "created_at": now,
+            }
+        added = [blocks[ii]["block_id"] for ii in idxs if is_new[ii]]
+        kept = [bid for bid in prev.get("block_ids", []) if bid in present]
+        rep = [bid for bid in prev.get("rep_block_ids", []) if bid in present] or (kept + added)[:5]
+        # New blocks first, so a concept already at the cap still lists what was assigned to it.
+        block_ids = (added + kept)[:200]
+        doc = {k: v for k, v in prev.items() if k not in ("_id", "updated_at")}
+        doc.update(
+            {
+                "run_id": cfg.run_id,
+                "source_run_id": read_run_id,
+                "rep_block_ids": rep,
+                "block_ids": block_ids,
+                "block_count": len(idxs),
+                "new_block_count": len(added),
+                "source_locale_distribution": dict(loc_dist),
+                "assigned_from_run_id": src,
+                "assigned_at": now,
+            }
+        )
+        out.append(doc)
+
+    # The next daily run can assign against this one.
+    key = f"assign:{src}"
+    save_vectorizer(base, cfg.run_id, "blocks_tfidf", key, vec, vec_meta["params"])
+    if components is not None:
+        save_array(base, cfg.run_id, "svd_components", components)
+    save_clustering(
+        base,
+        cfg.run_id,
+        key,
+        labels,
+        centers,
+        {**{k: v for k, v in meta.items() if k not in ("key", "run_id")}, "mean_distance": baseline},
+        block_ids=[b["block_id"] for b in blocks],
+    )
+    return out, info
+
+
+def _warm_start_init(cfg, vec, svd):
+    """Previous run's centroids projected into this run's feature space; returns (init or None, info)."""
+    src = cfg.warm_start_run_id
+    base = cfg.artifacts_dir
+    info = {"from_run_id": src}
+    loaded = load_vectorizer(base, src, "blocks_tfidf")
+    fit = load_clustering(base, [src], None)
+    if loaded is None or fit is None:
+        info["fallback"] = "no persisted vectorizer or cluster fit (run step 04 with --persist-tfidf)"
+        return None, info
+    old_vec, _ = loaded
+    _, centers, meta = fit
+    if (meta.get("reduction") or {}).get("components"):
+        components = load_array(base, src, "svd_components", mmap=False)
+        if components is None:
+            info["fallback"] = "svd_components missing"
+            return None, info
+        centers = centers @ components
+
+    # Old term space -> new vocabulary: shared terms keep their weights, dropped terms are lost.
+    vocab = vec.vocabulary_
+    pairs = [(i, vocab[t]) for i, t in enumerate(old_vec.get_feature_names_out()) if t in vocab]
+    info.update({"shared_terms": len(pairs), "previous_terms": len(old_vec.vocabulary_), "previous_k": len(centers)})
+    if not pairs:
+        info["fallback"] = "no shared terms"
+        return None, info
+    old_idx, new_idx = np.array(pairs).T
+    init = np.zeros((len(centers), len(vocab)))
+    init[:, new_idx] = centers[:, old_idx]
+    if svd is not None:
+        init = init @ svd.components_.T
+    return init, info
+
+
+def _match_centers(init: np.ndarray, centers: np.ndarray):
+    """Old -> new cluster index pairs that maximize total cosine similarity, with each pair's similarity."""
+    sim = normalize(init) @ normalize(centers).T
+    old, new = linear_sum_assignment(-sim)
+    return sorted(
+        ({"cluster_index": int(n), "previous_cluster_index": int(o), "similarity": round(float(sim[o, n]), 6)} for o, n in zip(old, new)),
+        key=lambda m: m["cluster_index"],
+    )
+
+
+def _fit(ctx, vec, mat, blocks, read_run_id):
+    cfg = ctx["config"]
+    # Cluster and pick representatives in the reduced space; keywords stay on the TF-IDF terms.
+    X = mat
+    svd = None
+    reduction = {}
+    if cfg.svd_components:
+        X, svd, reduction = reduce_dimensions(mat, cfg.svd_components)
+        if svd is not None:
+            meta = {"source_run_id": read_run_id, "shape": list(X.shape), **reduction}
+            save_block_embedding(cfg.artifacts_dir, cfg.run_id, [b["block_id"] for b in blocks], X, meta)
+            save_array(cfg.artifacts_dir, cfg.run_id, "svd_components", svd.components_.astype(np.float32))
+            ctx["logger"].info(
+                "SVD: %d components, explained variance %.3f, %.2fs",
+                reduction["components"],
+                reduction["explained_variance"],
+                reduction["seconds"],
+            )
+
+    k = max(1, min(cfg.k_clusters, len(blocks)))
+    auto_k = None
+    init, warm = None, None
+    if cfg.warm_start_run_id and cfg.vectorizer == "hashed":
+        warm = {"from_run_id": cfg.warm_start_run_id, "fallback": "warm start needs the vocabulary TF-IDF vectorizer"}
+        ctx["logger"].warning("Warm start: %s; fitting from k-means++", warm["fallback"])
+    elif cfg.warm_start_run_id:
+        init, warm = _warm_start_init(cfg, vec, svd)
+        if init is not None and len(init) > len(blocks):
+            init, warm["fallback"] = None, "more previous centroids than blocks"
+        if init is None:
+            ctx["logger"].warning("Warm start: %s; fitting from k-means++", warm["fallback"])
+        else:
+            init = init.astype(X.dtype)
+            k = len(init)
+    if init is None and cfg.k_candidates and len(blocks) > 2:
+        auto_k = sweep_k(
+            X,
+            cfg.k_candidates,
+            engine=cfg.cluster_engine,
+            sample_size=cfg.auto_k_sample_size,
+            workers=cfg.auto_k_workers,
+            batch_size=cfg.minibatch_size,
+        )
+        k = auto_k["chosen_k"]
+        ctx["logger"].info(
+            "Auto-k: chose k=%d from %s (%.2fs, %d workers)",
+            k,
+            [(r["k"], r["score"]) for r in auto_k["sweep"]],
+            auto_k["seconds"],
+            auto_k["workers"],
+        )
+    clustering = fit_clusters(
+        X,
+        k,
+        engine=cfg.cluster_engine,
+        sample_size=cfg.cluster_sample_size,
+        batch_size=cfg.minibatch_size,
+        init=init,
+    )
+    if warm is not None:
+        if init is not None:
+            warm["mapping"] = _match_centers(init, clustering.centers)
+        clustering.extra["warm_start"] = warm
+    ctx["logger"].info(
+        "Clustering %s: k=%d inertia=%.3f n_iter=%d fit=%.2fs assign=%.2fs",
+        clustering.engine,
+        clustering.k,
+        clustering.inertia,
+        clustering.n_iter,
+        clustering.fit_seconds,
+        clustering.assign_seconds,
+    )
+
+    return X, clustering, auto_k, reduction
+
+
 def run(ctx):
     cfg = ctx["config"]
     wdb = ctx["mongo"].write_db
     read_run_id = cfg.active_run_id or cfg.run_id
     include_locales = cfg.include_locales or []
 
+    hashed = cfg.vectorizer == "hashed"
+    # block_id order; the hashed matrix streams its rows in the same order.
     blocks = [
         b
-        for b in wdb["evidence_blocks"].find({"run_id": read_run_id})
+        for b in wdb["evidence_blocks"].find({"run_id": read_run_id}, {"text": 0} if hashed else None).sort("block_id", 1)
         if _locale_matches_prefix(b.get("source_locale", "und"), include_locales)
     ]
     if not blocks:
         Path("reports/concepts_summary.md").write_text("# Concepts\n\nNo evidence blocks.", encoding="utf-8")
         return
 
-    texts = [b["text"] for b in blocks]
-    vec, mat = build_tfidf(texts, locales=include_locales or ["ru", "pt", "sw"])
-    stopwords = set(get_stopwords_for_locales(include_locales or ["ru", "pt", "sw"]))
+    assign_info = None
+    if cfg.assign_from_run_id:
+        out, assign_info = _assign_only(ctx, blocks, read_run_id)
+        if out is not None:
+            ctx["logger"].info(
+                "Assign-only: %d new blocks into %d concepts of run %s (drift %.3f)",
+                assign_info["new_blocks"],
+                len(out),
+                assign_info["from_run_id"],
+                assign_info["drift"],
+            )
+            _write_concepts(wdb, cfg, out)
+            quality = {"run_id": cfg.run_id, "source_run_id": read_run_id, "concept_count": len(out), "assign": assign_info}
+            Path("reports/concepts_quality.json").write_text(
+                json.dumps(quality, ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+            )
+            return
+        ctx["logger"].warning("Assign-only: %s; reclustering all blocks", assign_info["fallback"])
+        ctx["warnings"].append(f"step 04 assign-only fell back to a full recluster: {assign_info['fallback']}")
 
-    k = max(1, min(cfg.k_clusters, len(blocks)))
-    km = KMeans(n_clusters=k, random_state=42, n_init=10)
-    labels = km.fit_predict(mat)
-    centers = km.cluster_centers_
+    locales = include_locales or ["ru", "pt", "sw"]
+    run_ids = [cfg.run_id, read_run_id]
+    row_keys = [f"{b['block_id']}:{b.get('text_hash') or sha1_text(b.get('text') or '')}" for b in blocks]
+    vectorization = None
+    if hashed:
+        vec, mat, vectorization, buckets = _hashed_matrix(ctx, read_run_id, blocks, locales)
+        tfidf_from = None
+        ctx["logger"].info(
+            "Hashed TF-IDF: %d rows x %d columns, %d nnz, %d batches, %.2fs",
+            vectorization["rows"],
+            vectorization["columns"],
+            vectorization["nnz"],
+            vectorization["batches"],
+            vectorization["seconds"],
+        )
+    else:
+        resolver = BlockTextResolver(ctx["mongo"].read_db)
+        vec, mat, tfidf_from = cached_tfidf(cfg, run_ids, "blocks_tfidf", row_keys, lambda: resolver.texts(blocks), locales=locales)
+    if tfidf_from:
+        ctx["logger"].info("TF-IDF: reused %s matrix from run %s", mat.shape, tfidf_from)
+    stopwords = set(get_stopwords_for_locales(locales))
 
-    cluster_to_idx = defaultdict(list)
-    for i, l in enumerate(labels):
-        cluster_to_idx[int(l)].append(i)
+    cached = None
+    cluster_key = corpus_hash(row_keys, {**_cluster_params(cfg), "locales": locales})
+    if cfg.persist_tfidf:
+        cached = _load_fit(cfg, run_ids, cluster_key, mat, blocks)
+    if cached is not None:
+        X, clustering, auto_k, reduction = cached
+        ctx["logger"].info("Clustering: reused labels and centers from run %s", clustering.extra.get("from_run_id"))
+    else:
+        X, clustering, auto_k, reduction = _fit(ctx, vec, mat, blocks, read_run_id)
+        if cfg.persist_tfidf:
+            meta = {
+                "clustering": clustering.summary(),
+                "auto_k": auto_k,
+                "reduction": reduction,
+                "mean_distance": clustering.inertia / len(blocks),
+            }
+            save_clustering(
+                cfg.artifacts_dir,
+                cfg.run_id,
+                cluster_key,
+                clustering.labels,
+                clustering.centers,
+                meta,
+                block_ids=[b["block_id"] for b in blocks],
+            )
+    labels = clustering.labels
+    centers = clustering.centers
+
+    # All per-cluster statistics in a few sparse products instead of a densified row per block.
+    k = clustering.k
+    members = cluster_members(labels, k)
+    top_terms = cluster_top_terms(mat, labels, k, top_n=50)
+    nearest = nearest_to_centroid(X, labels, centers, top_n=5)
+    _, first_seen = np.unique(labels, return_index=True)
+    cluster_order = [int(labels[i]) for i in sorted(first_seen)]
 
     now = datetime.now(timezone.utc).isoformat()
     out = []
@@ -85,12 +509,22 @@ def run(ctx):
     bad_titles = []
     good_titles = []
 
-    feats = vec.get_feature_names_out()
-    for ci, idxs in cluster_to_idx.items():
-        rows = mat[idxs]
-        mean = np.asarray(rows.mean(axis=0)).ravel()
-        top_idx = mean.argsort()[::-1][:50]
-        raw_keywords = [feats[i] for i in top_idx if mean[i] > 0]
+    warm = clustering.extra.get("warm_start")
+    warm_map, prev_concepts = {}, {}
+    if isinstance(warm, dict) and warm.get("mapping"):
+        warm_map = {m["cluster_index"]: m for m in warm["mapping"]}
+        prev_concepts = {d["cluster_index"]: d for d in wdb["kb_concepts"].find({"run_id": warm["from_run_id"]})}
+
+    if hashed:
+        # Name only the buckets we need, from a sample of each cluster's own texts.
+        sample = [blocks[ii] for idxs in members for ii in idxs[:HASHED_NAME_SAMPLE]]
+        bucket_names = bucket_terms(vec, _block_texts(ctx, read_run_id, sample))
+        names = {int(i): bucket_names[buckets[i]] for terms in top_terms for i in terms if buckets[i] in bucket_names}
+    else:
+        names = dict(enumerate(vec.get_feature_names_out()))
+    for ci in cluster_order:
+        idxs = members[ci]
+        raw_keywords = [names[i] for i in top_terms[ci] if i in names]
         filtered_keywords = [kw for kw in raw_keywords if _valid_kw(kw, stopwords)]
 
         raw_title_tokens = raw_keywords[:3]
@@ -109,15 +543,23 @@ def run(ctx):
         elif len(good_titles) < 10:
             good_titles.append(title_guess)
 
-        dists = []
-        for ii in idxs:
-            row = mat[ii].toarray()[0]
-            dist = np.linalg.norm(row - centers[ci])
-            dists.append((dist, ii))
-        rep = [blocks[ii]["block_id"] for _, ii in sorted(dists)[:5]]
+        rep = [blocks[ii]["block_id"] for ii in nearest[ci]]
         all_ids = [blocks[ii]["block_id"] for ii in idxs][:200]
 
         concept_id = f"cpt_{cfg.run_id}_{ci}"
+        previous = None
+        if ci in warm_map:
+            m = warm_map[ci]
+            prev = prev_concepts.get(m["previous_cluster_index"])
+            previous = {
+                "run_id": warm["from_run_id"],
+                "cluster_index": m["previous_cluster_index"],
+                "concept_id": prev["concept_id"] if prev else None,
+                "similarity": m["similarity"],
+            }
+            # A concept that stayed close to its previous centroid keeps its identity.
+            if prev and m["similarity"] >= WARM_START_MIN_SIMILARITY:
+                concept_id = prev["concept_id"]
         out.append(
             {
                 "concept_id": concept_id,
@@ -133,13 +575,10 @@ def run(ctx):
                 "created_at": now,
             }
         )
+        if previous is not None:
+            out[-1]["previous"] = previous
 
-    safe_upsert_many(wdb["kb_concepts"], out, "concept_id", cfg.run_id, dry_run=cfg.dry_run)
-    Path("reports/concepts_summary.json").write_text(json.dumps(out, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
-    Path("reports/concepts_summary.md").write_text(
-        "# Concepts\n\n" + "\n".join(f"- {d['concept_id']} ({d['block_count']} blocks): {d['title_guess']}" for d in out),
-        encoding="utf-8",
-    )
+    _write_concepts(wdb, cfg, out)
 
     quality = {
         "run_id": cfg.run_id,
@@ -150,5 +589,20 @@ def run(ctx):
         "top_10_titles_after": [d["title_guess"] for d in out[:10]],
         "sample_bad_titles": bad_titles,
         "sample_good_titles": good_titles,
+        "clustering": clustering.summary(),
     }
+    if auto_k:
+        quality["auto_k"] = auto_k
+    if reduction:
+        quality["reduction"] = {"method": "truncated_svd", **reduction}
+    if vectorization:
+        quality["vectorization"] = vectorization
+    if assign_info:
+        quality["assign"] = assign_info
+    if cfg.persist_tfidf:
+        quality["artifacts"] = {
+            "tfidf": f"reused from {tfidf_from}" if tfidf_from else "built",
+            "clustering": f"reused from {clustering.extra['from_run_id']}" if cached is not None else "fitted",
+            "cluster_key": cluster_key,
+        }
     Path("reports/concepts_quality.json").write_text(json.dumps(quality, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
@@ -8,9 +8,11 @@ from pathlib import Path
 import regex as re
 from sklearn.metrics.pairwise import cosine_similarity
 
+from ..common.block_text import BlockTextResolver
 from ..common.hashing import sha1_text
-from ..common.mongo import safe_upsert_many
-from ..common.normalize import normalize_ru_text
+from ..common.ids import canonical_hash
+from ..common.mongo import UpsertReport, safe_upsert_many
+from ..common.normalize import normalize_many, normalize_ru_text
 from ..common.tfidf import build_tfidf
 
 RUS_HEADINGS = {"симптомы", "диагностика", "лечение", "неотложно", "опасно", "причины"}
@@ -58,10 +60,11 @@ def _trim_sentence(s: str, max_len: int = 180) -> str:
     return s.strip()[:max_len]
 
 
-def _make_atom(concept_id: str, atom_type: str, text: str, b, cfg, read_run_id: str, now: str):
-    nln = normalize_ru_text(text)
+def _make_atom(concept_id: str, atom_type: str, text: str, b, cfg, read_run_id: str, now: str, nln: str | None = None):
+    if nln is None:
+        nln = normalize_ru_text(text)
     atom_id = sha1_text(f"{concept_id}|{atom_type}|{nln}")
-    return {
+    atom = {
         "atom_id": atom_id,
         "run_id": cfg.run_id,
         "source_run_id": read_run_id,
@@ -81,6 +84,8 @@ def _make_atom(concept_id: str, atom_type: str, text: str, b, cfg, read_run_id:
         "status": "draft",
         "created_at": now,
     }
+    atom["build_hash"] = canonical_hash({k: v for k, v in atom.items() if k not in ("run_id", "created_at")})
+    return atom
 
 
 def run(ctx):
@@ -95,20 +100,23 @@ def run(ctx):
     by_type = defaultdict(list)
     now = datetime.now(timezone.utc).isoformat()
 
+    resolver = BlockTextResolver(ctx["mongo"].read_db)
+
     for c in concepts:
         concept_atoms = []
         block_ids = (c.get("block_ids") or c.get("rep_block_ids") or [])[:200]
+        resolver.prefetch(blocks_by_id[bid] for bid in block_ids if bid in blocks_by_id)
         for bid in block_ids:
             b = blocks_by_id.get(bid)
             if not b:
                 continue
-            text = b.get("text", "")
+            text = resolver.text(b)
 
-            for ln in _split_lines(text):
-                nln = normalize_ru_text(ln)
+            lines = _split_lines(text)
+            for ln, nln in zip(lines, normalize_many(lines)):
                 matched_types = [t for t, cue_list in cues.items() if any(cu in nln for cu in cue_list)]
                 for atom_type in matched_types:
-                    concept_atoms.append(_make_atom(c["concept_id"], atom_type, ln, b, cfg, read_run_id, now))
+                    concept_atoms.append(_make_atom(c["concept_id"], atom_type, ln, b, cfg, read_run_id, now, nln))
 
         # sentence fallback only if missing critical types
         present = {a["atom_type"] for a in concept_atoms}
@@ -121,7 +129,7 @@ def run(ctx):
                 b = blocks_by_id.get(bid)
                 if not b:
                     continue
-                for sent in _split_sentences(b.get("text", "")):
+                for sent in _split_sentences(resolver.text(b)):
                     if len(sent.split()) < 6:
                         continue
                     item = _trim_sentence(sent)
@@ -130,26 +138,37 @@ def run(ctx):
                         hk = sha1_text(f"diagnostic_step|{key_norm}")
                         if hk not in seen:
                             seen.add(hk)
-                            concept_atoms.append(_make_atom(c["concept_id"], "diagnostic_step", item, b, cfg, read_run_id, now))
+                            concept_atoms.append(_make_atom(c["concept_id"], "diagnostic_step", item, b, cfg, read_run_id, now, key_norm))
                             added["diagnostic_step"] += 1
                     if RED_FLAG_RE.search(item) and needs_red and added["red_flag"] < 30:
                         hk = sha1_text(f"red_flag|{key_norm}")
                         if hk not in seen:
                             seen.add(hk)
-                            concept_atoms.append(_make_atom(c["concept_id"], "red_flag", item, b, cfg, read_run_id, now))
+                            concept_atoms.append(_make_atom(c["concept_id"], "red_flag", item, b, cfg, read_run_id, now, key_norm))
                             added["red_flag"] += 1
                     if TRIAGE_RE.search(item) and added["triage_step"] < 30:
                         hk = sha1_text(f"triage_step|{key_norm}")
                         if hk not in seen:
                             seen.add(hk)
-                            concept_atoms.append(_make_atom(c["concept_id"], "triage_step", item, b, cfg, read_run_id, now))
+                            concept_atoms.append(_make_atom(c["concept_id"], "triage_step", item, b, cfg, read_run_id, now, key_norm))
                             added["triage_step"] += 1
 
         for atom in concept_atoms:
             atoms.append(atom)
             by_type[atom["atom_type"]].append(atom)
 
-    safe_upsert_many(wdb["kb_atoms"], atoms, "atom_id", cfg.run_id, dry_run=cfg.dry_run)
+    write_report = UpsertReport("kb_atoms")
+    safe_upsert_many(
+        wdb["kb_atoms"],
+        atoms,
+        "atom_id",
+        cfg.run_id,
+        dry_run=cfg.dry_run,
+        batch_size=cfg.write_batch_size,
+        report=write_report,
+        diff_field="build_hash" if cfg.skip_unchanged_writes else None,
+    )
+    ctx.setdefault("write_reports", []).append(write_report.summary())
 
     dedup_docs = []
     for t, arr in by_type.items():
@@ -201,7 +220,7 @@ def run(ctx):
                         }
                     )
 
-    safe_upsert_many(wdb["dedup_groups"], dedup_docs, "dedup_id", cfg.run_id, dry_run=cfg.dry_run)
+    safe_upsert_many(wdb["dedup_groups"], dedup_docs, "dedup_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)
 
     summary = {
         "atoms_total": len(atoms),
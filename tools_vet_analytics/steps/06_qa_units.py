@@ -5,9 +5,10 @@ from collections import Counter, defaultdict
 from datetime import datetime, timezone
 from pathlib import Path
 
+from ..common.block_text import BLOCK_TEXT_FIELDS, BlockTextResolver
 from ..common.ids import canonical_hash
 from ..common.hashing import sha1_text
-from ..common.mongo import safe_upsert_many
+from ..common.mongo import UpsertReport, safe_upsert_many
 
 
 def _pick_locale(refs):
@@ -108,7 +109,11 @@ def run(ctx):
 
     concepts = list(wdb["kb_concepts"].find({"run_id": read_run_id}))
     atoms = list(wdb["kb_atoms"].find({"run_id": read_run_id}))
-    blocks_by_id = {b["block_id"]: b for b in wdb["evidence_blocks"].find({"run_id": read_run_id}, {"block_id": 1, "text": 1})}
+    blocks_by_id = {
+        b["block_id"]: b
+        for b in wdb["evidence_blocks"].find({"run_id": read_run_id}, {"block_id": 1, **{f: 1 for f in BLOCK_TEXT_FIELDS}})
+    }
+    resolver = BlockTextResolver(ctx["mongo"].read_db)
 
     atoms_by_concept = defaultdict(list)
     for a in atoms:
@@ -133,7 +138,8 @@ def run(ctx):
         rep_text = ""
         rep_ids = c.get("rep_block_ids", [])
         if rep_ids:
-            rep_text = (blocks_by_id.get(rep_ids[0]) or {}).get("text", "")
+            rep_block = blocks_by_id.get(rep_ids[0])
+            rep_text = resolver.text(rep_block) if rep_block else ""
 
         b2c_summary = " ".join([a["text"] for a in (by_type["owner_action"] + by_type["note_limitation"])[:3]])[:600]
         if not b2c_summary:
@@ -177,7 +183,16 @@ def run(ctx):
                 "source_refs": agg_refs,
                 "status": "draft",
                 "version": 1,
-                "build_hash": canonical_hash({"content": content, "included_atoms": included}),
+                "build_hash": canonical_hash(
+                    {
+                        "content": content,
+                        "included_atoms": included,
+                        "title": c.get("title_guess"),
+                        "questions": questions,
+                        "keywords": keywords,
+                        "source_refs": agg_refs,
+                    }
+                ),
                 "build_meta": {
                     "run_id": cfg.run_id,
                     "method": "rule_based_v1",
@@ -190,6 +205,17 @@ def run(ctx):
             if len(sample) < 10:
                 sample.append(unit)
 
-    safe_upsert_many(wdb["qa_units"], out, "qa_unit_id", cfg.run_id, dry_run=cfg.dry_run)
+    write_report = UpsertReport("qa_units")
+    safe_upsert_many(
+        wdb["qa_units"],
+        out,
+        "qa_unit_id",
+        cfg.run_id,
+        dry_run=cfg.dry_run,
+        batch_size=cfg.write_batch_size,
+        report=write_report,
+        diff_field="build_hash" if cfg.skip_unchanged_writes else None,
+    )
+    ctx.setdefault("write_reports", []).append(write_report.summary())
     Path("reports/qa_units_summary.md").write_text("# QA Units\n\nTotal: %d" % len(out), encoding="utf-8")
     Path("reports/qa_units_sample.json").write_text(json.dumps(sample, ensure_ascii=False, indent=2), encoding="utf-8")
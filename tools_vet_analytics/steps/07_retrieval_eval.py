@@ -6,6 +6,8 @@ from pathlib import Path
 
 from sklearn.metrics.pairwise import cosine_similarity
 
+from ..common.artifacts import cached_tfidf
+from ..common.hashing import sha1_text
 from ..common.mongo import safe_insert_one
 from ..common.tfidf import build_tfidf
 
@@ -19,7 +21,9 @@ def run(ctx):
         return
 
     docs = [" ".join([u.get("title", ""), " ".join(u.get("questions", [])), " ".join(u.get("keywords", []))]) for u in units]
-    vec, mat = build_tfidf(docs, max_features=10000)
+    vec, mat, _ = cached_tfidf(
+        cfg, [cfg.run_id, read_run_id], "qa_units_tfidf", (sha1_text(d) for d in docs), lambda: docs, max_features=10000
+    )
 
     queries = [q for u in units for q in u.get("questions", [])]
     random.seed(42)
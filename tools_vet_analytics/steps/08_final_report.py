@@ -33,6 +33,7 @@ def run(ctx):
     concept_blocks = [c.get("block_count", 0) for c in concepts] or [0]
     atom_dedup_groups = [d for d in dedups if d.get("dedup_type") == "atom"]
     dedup_rate = len(atom_dedup_groups) / (len(atoms) or 1)
+    raw_near_groups = [d for d in dedups if d.get("method") == "near_minhash"]
 
     gaps = {
         "concepts_zero_red_flags": [
@@ -140,6 +141,8 @@ def run(ctx):
         "atom_dedup_groups": len(atom_dedup_groups),
         "atom_dedup_rate": dedup_rate,
         "dedup_groups_total": len(dedups),
+        "raw_near_dup_groups": len(raw_near_groups),
+        "raw_near_dup_texts": sum(len(d.get("norm_hashes", [])) for d in raw_near_groups),
         "qa_units_total": len(qa),
     }
 
@@ -166,6 +169,8 @@ def run(ctx):
             "reports/final_report.md",
         ],
         "warnings": ctx.get("warnings", []),
+        "index_report": ctx.get("index_report", []),
+        "write_reports": ctx.get("write_reports", []),
     }
     Path("reports/final_report.json").write_text(json.dumps(final, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
     Path("reports/final_report.md").write_text(
@@ -175,8 +180,9 @@ def run(ctx):
         f"- concepts: {coverage['concepts']}\n"
         f"- atoms: {coverage['atoms_total']}\n"
         f"- qa units: {coverage['qa_units_total']}\n"
-        f"- bad titles pct: {title_stats['pct_stopword_only_titles']:.2%}\n",
+        f"- bad titles pct: {title_stats['pct_stopword_only_titles']:.2%}\n"
+        f"- unchanged writes skipped: {sum(r.get('skipped_unchanged', 0) for r in final['write_reports'])}\n",
         encoding="utf-8",
     )
 
-    safe_upsert_many(wdb["run_reports"], [final], "report_id", cfg.run_id, dry_run=cfg.dry_run)
+    safe_upsert_many(wdb["run_reports"], [final], "report_id", cfg.run_id, dry_run=cfg.dry_run, batch_size=cfg.write_batch_size)